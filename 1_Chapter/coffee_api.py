@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from fastapi import FastAPI
 import joblib
 from pathlib import Path
+from compiled_model import compile_model
 
 class CoffeeQualityInput(BaseModel):
     # Use apt data type for each attribute of coffee quality
@@ -24,9 +25,10 @@ def predict_quality(coffee_data: CoffeeQualityInput) -> QualityPrediction:
         coffee_data.altitude
     ]]
 
-    # Make prediction
-    quality_score = model.predict(features)[0]
-    confidence = float(max(model.predict_proba(features)[0]))
+    # Make prediction (label and probabilities in a single pass)
+    quality_scores, probabilities = model.predict_with_proba(features)
+    quality_score = quality_scores[0]
+    confidence = float(probabilities[0].max())
 
     return QualityPrediction(quality_score=quality_score, confidence=confidence)
 
@@ -36,7 +38,9 @@ app = FastAPI()
 # Load the pre-trained model
 SCRIPT_DIR = Path(__file__).parent
 MODEL_PATH = SCRIPT_DIR / 'models/coffee_quality_model.pkl'
-model = joblib.load(MODEL_PATH)
+# NOTE: compile_model returns a pure NumPy engine for linear models
+# (set INFERENCE_BACKEND=sklearn to use the sklearn estimator instead)
+model = compile_model(joblib.load(MODEL_PATH))
 
 # Specify the data model to validate response
 @app.post("/predict", response_model=QualityPrediction) 
@@ -0,0 +1,157 @@
+import os
+import warnings
+import numpy as np
+from scipy.special import expit
+
+# Set INFERENCE_BACKEND=sklearn to skip the compiled fast path and use the
+# fitted scikit-learn estimator directly
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "compiled")
+
+
+class SklearnModel:
+    """
+    Thin wrapper that gives a fitted scikit-learn estimator the same
+    interface as CompiledLinearModel (used as the fallback backend)
+    """
+    backend = "sklearn"
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+        self.classes_ = getattr(estimator, "classes_", None)
+
+    def predict(self, X):
+        return self.estimator.predict(X)
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(X)
+
+    def predict_with_proba(self, X):
+        proba = self.estimator.predict_proba(X)
+        return self.classes_[proba.argmax(axis=1)], proba
+
+
+class CompiledLinearModel:
+    """
+    Pure NumPy inference for fitted linear models.
+
+    coef_, intercept_ and classes_ are extracted once at load time, so a
+    prediction is a single matrix-vector product followed by a sigmoid or
+    softmax, without sklearn's per-call input validation
+    """
+    backend = "compiled"
+
+    def __init__(self, coef, intercept, classes=None, multinomial=False):
+        coef = np.asarray(coef, dtype=np.float64)
+        # Store coefficients transposed and contiguous for X @ coef
+        self.coef = np.ascontiguousarray(coef.T)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes_ = classes
+        self.multinomial = multinomial
+        self.n_features_in_ = coef.shape[-1]
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        if not hasattr(estimator, "coef_") or not hasattr(estimator, "intercept_"):
+            raise TypeError(f"{type(estimator).__name__} is not a fitted linear model")
+
+        classes = getattr(estimator, "classes_", None)
+        if classes is None:
+            return cls(estimator.coef_, estimator.intercept_)
+
+        if not hasattr(estimator, "predict_proba"):
+            raise TypeError(f"{type(estimator).__name__} does not provide probabilities")
+        # Same rule LogisticRegression uses to choose between one-vs-rest
+        # (sigmoid) and multinomial (softmax) probabilities
+        multi_class = getattr(estimator, "multi_class", "auto")
+        ovr = (multi_class in ("ovr", "warn")
+               or (multi_class in ("auto", "deprecated")
+                   and (len(classes) <= 2 or getattr(estimator, "solver", None) == "liblinear")))
+        return cls(estimator.coef_, estimator.intercept_, classes, multinomial=not ovr)
+
+    def _as_array(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}"
+            )
+        return X
+
+    def decision_function(self, X):
+        scores = self._as_array(X) @ self.coef + self.intercept
+        if scores.ndim == 2 and scores.shape[1] == 1:
+            scores = scores.ravel()
+        return scores
+
+    def _proba_from_scores(self, scores):
+        if scores.ndim == 1:
+            # Binary classification: one logit per row. Multinomial models use
+            # the softmax of (-logit, logit), which is the sigmoid of 2 * logit
+            positive = expit(2 * scores if self.multinomial else scores)
+            return np.column_stack([1 - positive, positive])
+        if self.multinomial:
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            return scores / scores.sum(axis=1, keepdims=True)
+        # One-vs-rest: independent sigmoids normalized to sum to one
+        proba = expit(scores)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if self.classes_ is None:
+            return scores
+        if scores.ndim == 1:
+            return self.classes_[(scores > 0).astype(np.intp)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def predict_proba(self, X):
+        if self.classes_ is None:
+            raise AttributeError("Regression models do not provide probabilities")
+        return self._proba_from_scores(self.decision_function(X))
+
+    def predict_with_proba(self, X):
+        # Labels and probabilities from a single pass over the input
+        scores = self.decision_function(X)
+        proba = self._proba_from_scores(scores)
+        if scores.ndim == 1:
+            labels = self.classes_[(scores > 0).astype(np.intp)]
+        else:
+            labels = self.classes_[scores.argmax(axis=1)]
+        return labels, proba
+
+
+def verify_equivalence(compiled, estimator, n_samples=256, seed=0) -> bool:
+    """
+    Check the compiled model against the sklearn estimator on random inputs
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=10, size=(n_samples, compiled.n_features_in_))
+    with warnings.catch_warnings():
+        # Estimators fitted on DataFrames warn about missing feature names
+        warnings.simplefilter("ignore", UserWarning)
+        expected = estimator.predict(X)
+        if compiled.classes_ is None:
+            return np.allclose(compiled.predict(X), expected, rtol=1e-9, atol=1e-12)
+        expected_proba = estimator.predict_proba(X)
+    return (np.array_equal(compiled.predict(X), expected)
+            and np.allclose(compiled.predict_proba(X), expected_proba, rtol=1e-9, atol=1e-12))
+
+
+def compile_model(estimator, backend=INFERENCE_BACKEND):
+    """
+    Return a CompiledLinearModel for `estimator`, or fall back to the sklearn
+    estimator if the backend is disabled, the model is not linear or the
+    compiled outputs do not match sklearn
+    """
+    if backend != "compiled":
+        return SklearnModel(estimator)
+    try:
+        compiled = CompiledLinearModel.from_estimator(estimator)
+    except TypeError as e:
+        print(f"[INFO] Using sklearn inference: {e}")
+        return SklearnModel(estimator)
+    if not verify_equivalence(compiled, estimator):
+        print("[WARNING] Compiled model does not match sklearn outputs, using sklearn inference")
+        return SklearnModel(estimator)
+    return compiled
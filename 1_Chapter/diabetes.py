@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 import joblib
 from pathlib import Path
+from compiled_model import compile_model
 
 class DiabetesFeatures(BaseModel):
     age: int
@@ -15,7 +16,9 @@ SCRIPT_DIR = Path(__file__).parent
 
 MODEL_PATH = SCRIPT_DIR / 'models/diabetes_model.pkl'
 
-model = joblib.load(MODEL_PATH)
+# NOTE: compile_model returns a pure NumPy engine for linear regressors
+# (set INFERENCE_BACKEND=sklearn to use the sklearn estimator instead)
+model = compile_model(joblib.load(MODEL_PATH))
 
 # Create a POST request endpoint at the route "/predict"
 @app.post("/predict")
@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
+from typing import List, Optional
+from model_registry import ModelRegistry
 
 app = FastAPI()
 
-model_db = {}
+# Persistent model metadata (SQLite), shared by every worker
+model_db = ModelRegistry()
 
 class ModelInfo(BaseModel):
     model_id: int
@@ -14,8 +17,17 @@ class RegisterModelResponse(BaseModel):
     message: str
     model: ModelInfo
 
+class RegisterModelsResponse(BaseModel):
+    message: str
+    count: int
+
+class ModelListResponse(BaseModel):
+    models: List[ModelInfo]
+    # Pass as `after` to get the next page (None on the last page)
+    next_after: Optional[int]
+
 def get_model_details(model_id: int):
-    # Simulate fetching model details from a database
+    # Fetch model details from the registry (hot ids are served from memory)
     model = model_db.get(model_id)
     if model:
         return model['model_name']
@@ -25,7 +37,9 @@ def get_model_details(model_id: int):
 # Add model_id as a path parameter in the route
 @app.get("/model-info/{model_id}")
 # Pass on the model id as an argument
-async def get_model_info(model_id: int):
+# NOTE: a plain def, so FastAPI runs it in the threadpool; a registry cache
+# miss is a blocking SQLite query that must not run on the event loop
+def get_model_info(model_id: int):
     if model_id == 0:
       	# Raise the right status code for not found
         raise HTTPException(status_code=404, detail="Model not found")
@@ -40,7 +54,7 @@ async def get_model_info(model_id: int):
 # Pass the model info from the request as function parameter 
 def register_model(model_info: ModelInfo):
     # Add new model's information dictionary to the model database
-    model_db[model_info.model_id] = model_info.model_dump()
+    model_db.register(model_info.model_dump())
     
     return RegisterModelResponse(
         message="Model registered successfully",
@@ -48,6 +62,33 @@ def register_model(model_info: ModelInfo):
     )
 
 
+# Register many models in a single transaction
+@app.post("/register-models", status_code=201, response_model=RegisterModelsResponse)
+def register_models(models: List[ModelInfo]):
+    count = model_db.register_many([model.model_dump() for model in models])
+    return RegisterModelsResponse(
+        message="Models registered successfully",
+        count=count
+    )
+
+
+# List registered models, ordered by id and filtered by name or description
+@app.get("/models", response_model=ModelListResponse)
+def list_models(
+    name: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    search: Optional[str] = Query(None, description="Substring of the description"),
+    after: Optional[int] = Query(None, description="Last model_id of the previous page"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    models = model_db.list_models(name=name, name_prefix=name_prefix, search=search,
+                                  after=after, limit=limit)
+    return ModelListResponse(
+        models=models,
+        next_after=models[-1]["model_id"] if len(models) == limit else None
+    )
+
+
 # curl -X POST "http://localhost:8000/register-model" \
 #   -H "Content-Type: application/json" \
 #   -d '{
@@ -58,3 +99,12 @@ def register_model(model_info: ModelInfo):
 
 
 # curl -X GET "http://localhost:8000/model-info/1"
+
+# curl -X POST "http://localhost:8000/register-models" \
+#   -H "Content-Type: application/json" \
+#   -d '[
+#     {"model_id": 2, "model_name": "BERT", "description": "Encoder language model"},
+#     {"model_id": 3, "model_name": "ResNet-50", "description": "Image classifier"}
+#   ]'
+
+# curl -X GET "http://localhost:8000/models?name_prefix=GPT&limit=50"
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List
+
+# Ensure the data directory exists
+Path(__file__).parent.joinpath("data").mkdir(parents=True, exist_ok=True)
+PATH_TO_REGISTRY_DB = Path(os.getenv(
+    "MODEL_REGISTRY_DB", Path(__file__).parent / "data" / "model_registry.db"
+))
+# Hot /model-info lookups are served from memory for up to this many seconds.
+# Other workers write to the same database, so entries must not live forever
+REGISTRY_CACHE_SIZE = int(os.getenv("MODEL_REGISTRY_CACHE_SIZE", "10000"))
+REGISTRY_CACHE_TTL = float(os.getenv("MODEL_REGISTRY_CACHE_TTL", "5"))
+
+
+class ModelRegistry:
+    """
+    SQLite (WAL) registry of model metadata.
+
+    Every thread of the worker gets its own connection, opened on first use
+    and kept for the lifetime of the process. Lookups by id go through a
+    small read-through LRU cache
+    """
+    def __init__(self, db_path=PATH_TO_REGISTRY_DB, cache_size: int = REGISTRY_CACHE_SIZE,
+                 cache_ttl: float = REGISTRY_CACHE_TTL):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # model_id -> (model dict, expires_at)
+        self._cache = OrderedDict()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS models (
+                    model_id INTEGER PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # Name filters (exact and prefix); lookups by id use the primary key
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_models_name ON models (model_name, model_id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _cache_get(self, model_id: int):
+        with self._lock:
+            entry = self._cache.get(model_id)
+            if entry is None:
+                return None
+            model, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._cache[model_id]
+                return None
+            self._cache.move_to_end(model_id)
+            return model
+
+    def _cache_put(self, model: dict):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[model["model_id"]] = (model, time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(model["model_id"])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_discard(self, model_ids):
+        with self._lock:
+            for model_id in model_ids:
+                self._cache.pop(model_id, None)
+
+    def get(self, model_id: int):
+        model = self._cache_get(model_id)
+        if model is not None:
+            return dict(model)
+        row = self._connection().execute(
+            "SELECT model_id, model_name, description FROM models WHERE model_id = ?",
+            (model_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        model = dict(row)
+        self._cache_put(model)
+        return dict(model)
+
+    def register(self, model: dict):
+        self.register_many([model])
+
+    def register_many(self, models: List[dict]) -> int:
+        # One transaction for the whole batch; re-registering an id replaces it
+        now = time.time()
+        rows = [(m["model_id"], m["model_name"], m["description"], now, now) for m in models]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO models (model_id, model_name, description, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(model_id) DO UPDATE SET model_name = excluded.model_name, "
+                "description = excluded.description, updated_at = excluded.updated_at",
+                rows
+            )
+        self._cache_discard([row[0] for row in rows])
+        return len(rows)
+
+    def list_models(self, name: str = None, name_prefix: str = None, search: str = None,
+                    after: int = None, limit: int = 100) -> List[dict]:
+        """
+        Page of models ordered by id. Pass the last id of a page as `after`
+        to get the next one (keyset pagination, no OFFSET scans)
+        """
+        clauses, params = [], []
+        if name is not None:
+            clauses.append("model_name = ?")
+            params.append(name)
+        if name_prefix:
+            # Range on the name index instead of LIKE, which SQLite can not index here
+            clauses.append("model_name >= ? AND model_name < ?")
+            params += [name_prefix, name_prefix + "\U0010ffff"]
+        if search:
+            # NOTE: Substring search scans the filtered rows, there is no index for it
+            clauses.append("instr(lower(description), ?) > 0")
+            params.append(search.lower())
+        if after is not None:
+            clauses.append("model_id > ?")
+            params.append(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT model_id, model_name, description FROM models {where} "
+            "ORDER BY model_id LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._cache.clear()
+        self._local = threading.local()
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 import joblib
+import numpy as np
+from operator import attrgetter
 from pathlib import Path
-import pandas as pd
 
 SCRIPT_DIR = Path(__file__).parent
 
@@ -10,6 +11,15 @@ MODEL_PATH = SCRIPT_DIR / 'models/penguin_classifier.pkl'
 
 model = joblib.load(MODEL_PATH)
 
+# Fix the column order once from the fitted model, so requests can be turned
+# into NumPy arrays directly instead of building a DataFrame per prediction
+get_features = attrgetter(*model.feature_names_in_)
+# The pipeline was fitted on a DataFrame, so sklearn warns on every plain
+# array. The column order is now guaranteed by get_features, so the names
+# are dropped from the first step (the only one that stores them)
+del model[0].feature_names_in_
+
+
 app = FastAPI()
 
 # Define el modelo de datos para la petición
@@ -21,10 +31,11 @@ class PenguinFeatures(BaseModel):
 
 @app.post("/predict")
 def predict(penguin: PenguinFeatures):
-    df = pd.DataFrame([penguin.model_dump()])
+    features = np.array([get_features(penguin)], dtype=np.float64)
     
-    predictions = model.predict(df)
-    confidence = model.predict_proba(df)
+    # A single predict_proba pass gives both the confidence and the species
+    confidence = model.predict_proba(features)
+    predictions = model.classes_[confidence.argmax(axis=1)]
 
     return {"predicted_species": predictions.tolist(),
             "confidence": confidence.tolist(),
@@ -0,0 +1,119 @@
+from collections import deque
+from typing import List
+
+
+def load_terms(path):
+    """
+    Load a keyword list with one term or phrase per line.
+    Blank lines and lines starting with '#' are ignored
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordEngine:
+    """
+    Aho-Corasick automaton over a keyword lexicon.
+
+    The automaton is built once, then every term is matched in a single pass
+    over the text, so the cost per text depends on the text length and the
+    number of matches, not on the size of the lexicon. With casefold=True
+    terms and text are compared after Unicode casefolding ("Straße" matches
+    "STRASSE"); match positions always refer to the original text
+    """
+    def __init__(self, terms, casefold: bool = True):
+        self.casefold = casefold
+        # Distinct terms in lexicon order (after folding)
+        self.terms = []
+        seen = set()
+        for term in terms:
+            key = self._fold(term.strip())
+            if key and key not in seen:
+                seen.add(key)
+                self.terms.append(term.strip())
+        self.positions = {term: i for i, term in enumerate(self.terms)}
+
+        # State 0 is the root. goto[state] maps a character to the next state,
+        # fail[state] is the longest proper suffix that is also a state and
+        # out[state] lists (term index, term length) of every term ending there
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for ch in self._fold(term):
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = next_state
+            self.out[state] = ((index, len(self._fold(term))),)
+
+        # Breadth-first pass to set failure links and merge suffix outputs
+        # (children of the root keep fail = 0)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    @classmethod
+    def from_file(cls, path, casefold: bool = True):
+        return cls(load_terms(path), casefold=casefold)
+
+    def _fold(self, text: str) -> str:
+        return text.casefold() if self.casefold else text
+
+    def _folded_with_positions(self, text: str):
+        # Casefolding can change the length ("ß" -> "ss"); keep a map from each
+        # folded character back to its position in the original text
+        folded = self._fold(text)
+        if len(folded) == len(text):
+            return folded, None
+        positions = []
+        for i, ch in enumerate(text):
+            positions.extend([i] * len(self._fold(ch)))
+        return "".join(self._fold(ch) for ch in text), positions
+
+    def find(self, text: str, word_boundary: bool = False) -> List[dict]:
+        """
+        Every occurrence of every term, as {"term", "start", "end"} with
+        positions in the original text, ordered by end position.
+        With word_boundary=True, matches inside a longer word are skipped
+        """
+        folded, positions = self._folded_with_positions(text)
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for index, length in out[state]:
+                start, end = i - length + 1, i + 1
+                if positions is not None:
+                    start, end = positions[start], positions[end - 1] + 1
+                if word_boundary and ((start > 0 and _is_word_char(text[start - 1]))
+                                      or (end < len(text) and _is_word_char(text[end]))):
+                    continue
+                matches.append({"term": self.terms[index], "start": start, "end": end})
+        return matches
+
+    def issues(self, matches: List[dict]) -> List[str]:
+        # Distinct matched terms, in lexicon order
+        return sorted({match["term"] for match in matches}, key=self.positions.__getitem__)
@@ -1,12 +1,16 @@
 import numpy as np
 from fastapi import FastAPI
 from pydantic import BaseModel
+from typing import List
 
 class CommentMetrics(BaseModel):
     length: int
     user_reputation: int
     report_count: int
 
+class CommentBatch(BaseModel):
+    comments: List[CommentMetrics]
+
 class CommentScorer:
     def predict(self, features: np.ndarray) -> float:
         """
@@ -23,6 +27,22 @@ class CommentScorer:
         
         return float(max(min(score * 100, 100), 0))  # Scale to 0-100
 
+    def predict_batch(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict trust scores for many comments at once
+        features: (N, 3) array of [length, user_reputation, report_count]
+        """
+        # Unpack feature columns
+        length, reputation, reports = features[:, 0], features[:, 1], features[:, 2]
+
+        # Same float64 operations, in the same order, as predict, so every row
+        # gets exactly the score it would get on its own
+        score = (0.3 * (length/500) +        # Normalize length
+                 0.5 * (reputation/100) +    # Normalize reputation
+                 -0.2 * reports)             # Reports reduce score
+
+        return np.maximum(np.minimum(score * 100, 100), 0)  # Scale to 0-100
+
 
 app = FastAPI()
 model = CommentScorer()
@@ -42,6 +62,20 @@ def predict_trust(comment: CommentMetrics):
         "comment_metrics": comment.model_dump()
     }
     
+@app.post("/predict_trust/batch")
+def predict_trust_batch(batch: CommentBatch):
+    # Build the (N, 3) feature array in one go and score it with a single call
+    features = np.array([
+        (comment.length, comment.user_reputation, comment.report_count)
+        for comment in batch.comments
+    ], dtype=np.int64).reshape(-1, 3)
+    scores = model.predict_batch(features)
+    return {
+        # Python's round() keeps the results identical to /predict_trust
+        "trust_scores": [round(score, 2) for score in scores.tolist()],
+        "count": len(batch.comments)
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -54,3 +88,12 @@ if __name__ == "__main__":
 #         "user_reputation": 100,
 #         "report_count": 0
 #         }'
+
+# curl -X POST "http://localhost:8080/predict_trust/batch" \
+#     -H "Content-Type: application/json" \
+#     -d '{
+#         "comments": [
+#             {"length": 150, "user_reputation": 100, "report_count": 0},
+#             {"length": 20, "user_reputation": 5, "report_count": 3}
+#         ]
+#         }'
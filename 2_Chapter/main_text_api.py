@@ -1,25 +1,78 @@
-from fastapi import FastAPI
+import os
+from typing import List
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from keyword_engine import KeywordEngine
+
+# Default lexicon; set KEYWORDS_PATH to a file with one term or phrase per line
+PROBLEM_KEYWORDS = ["spam", "hate", "offensive", "abuse"]
+KEYWORDS_PATH = os.getenv("KEYWORDS_PATH")
+KEYWORDS_CASEFOLD = os.getenv("KEYWORDS_CASEFOLD", "true").lower() == "true"
+
+class CommentTexts(BaseModel):
+    texts: List[str]
+    word_boundary: bool = False
+
+def load_engine() -> KeywordEngine:
+    # Build the automaton once; requests only walk it
+    if KEYWORDS_PATH:
+        return KeywordEngine.from_file(KEYWORDS_PATH, casefold=KEYWORDS_CASEFOLD)
+    return KeywordEngine(PROBLEM_KEYWORDS, casefold=KEYWORDS_CASEFOLD)
 
 app = FastAPI()
+engine = load_engine()
+print(f"[STARTUP] Keyword engine loaded with {len(engine.terms)} terms")
 
-@app.post("/analyze_comment")
-def analyze_comment(text: str):
-    problem_keywords = ["spam", "hate", "offensive", "abuse"]
-    
-    # Convert the input text to lowercase
-    text_lower = text.lower()
-    # Extract matching flags using list comprehension
-    found_issues = [keyword for keyword in problem_keywords if keyword in text_lower]
-    # Return the dictionary with required keys
+def analyze(text: str, word_boundary: bool = False) -> dict:
+    # Read the global once so a reload in between can't mix two lexicons
+    current = engine
+    matches = current.find(text, word_boundary=word_boundary)
+    found_issues = current.issues(matches)
     return {
         "issues": found_issues,
         "issue_count": len(found_issues),
+        "matches": matches,
         "original_text": text
     }
 
+@app.post("/analyze_comment")
+def analyze_comment(text: str, word_boundary: bool = False):
+    # Single pass over the text, whatever the size of the lexicon
+    return analyze(text, word_boundary)
+
+@app.post("/analyze_comments")
+def analyze_comments(batch: CommentTexts):
+    results = [analyze(text, batch.word_boundary) for text in batch.texts]
+    return {"results": results, "count": len(results)}
+
+@app.post("/keywords/reload")
+def reload_keywords():
+    global engine
+    try:
+        new_engine = load_engine()
+    except OSError as e:
+        print(f"[ERROR] Could not reload keywords: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not load keywords: {e}")
+    # NOTE: the new automaton is fully built before the swap, requests in
+    # flight keep using the old one
+    engine = new_engine
+    print(f"[INFO] Keyword engine reloaded with {len(engine.terms)} terms")
+    return {"message": "Keywords reloaded", "term_count": len(engine.terms)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 
 # curl -X POST "http://localhost:8000/analyze_comment?text=Este%20comentario%20es%20spam%20y%20ofensivo"
+
+# curl -X POST "http://localhost:8000/analyze_comment?text=spammer%20y%20spam&word_boundary=true"
+
+# curl -X POST "http://localhost:8000/analyze_comments" \
+#     -H "Content-Type: application/json" \
+#     -d '{
+#         "texts": ["Esto es SPAM", "Comentario normal", "hate and abuse"],
+#         "word_boundary": false
+#         }'
+
+# curl -X POST "http://localhost:8000/keywords/reload"
@@ -1,4 +1,6 @@
+import string
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -10,6 +12,54 @@ from pathlib import Path
 Path(__file__).parent.joinpath("models").mkdir(parents=True, exist_ok=True)
 PATH_TO_MODEL = Path(__file__).parent / "models" / "sentiment_model.joblib"
 
+POSITIVE_WORDS = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
+NEGATIVE_WORDS = ["hate", "terrible", "worst", "disappointed", "awful"]
+
+
+def load_lexicon(path):
+    """
+    Load a lexicon file with one term per line.
+    Blank lines and lines starting with '#' are ignored
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip().lower() for line in f
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+class SentimentFeaturizer:
+    """
+    Turns raw text into the [num_words, num_positive_words, num_complaints]
+    features used by the sentiment model.
+
+    The text is lowercased and tokenized once, and tokens are looked up in
+    hash sets, so the cost does not grow with the size of the lexicons and
+    words are only matched as whole tokens ("best" does not match "bestow")
+    """
+    def __init__(self, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS):
+        self.positive_words = frozenset(word.lower() for word in positive_words)
+        self.negative_words = frozenset(word.lower() for word in negative_words)
+
+    @classmethod
+    def from_files(cls, positive_path, negative_path):
+        return cls(load_lexicon(positive_path), load_lexicon(negative_path))
+
+    def featurize(self, text) -> list:
+        words = text.lower().split()
+        # Strip surrounding punctuation so "fantastic!" matches "fantastic"
+        tokens = {word.strip(string.punctuation) for word in words}
+        return [
+            len(words),
+            len(tokens & self.positive_words),
+            len(tokens & self.negative_words)
+        ]
+
+    def transform(self, texts) -> np.ndarray:
+        # Featurize a list of texts into a single (n_texts, 3) matrix
+        features = np.empty((len(texts), 3), dtype=np.float64)
+        for i, text in enumerate(texts):
+            features[i] = self.featurize(text)
+        return features
+
 # Model creation
 def train_and_save_model():
     data = {
@@ -30,12 +80,12 @@ def train_and_save_model():
 
     df = pd.DataFrame(data)
 
-    positive_words = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
-    negative_words = ["hate", "terrible", "worst", "disappointed", "awful"]
-
-    df["num_words"] = df["review"].apply(lambda x: len(x.split()))
-    df["num_positive_words"] = df["review"].apply(lambda x: sum(word in x.lower() for word in positive_words))
-    df["num_complaints"] = df["review"].apply(lambda x: sum(word in x.lower() for word in negative_words))
+    # Use the same featurizer as inference so training and serving stay in sync
+    featurizer = SentimentFeaturizer()
+    features = featurizer.transform(df["review"].tolist())
+    df["num_words"] = features[:, 0]
+    df["num_positive_words"] = features[:, 1]
+    df["num_complaints"] = features[:, 2]
 
     X = df[["num_words", "num_positive_words", "num_complaints"]]
     y = df["label"]
@@ -49,7 +99,7 @@ def train_and_save_model():
 
 # Define a callable class
 class SentimentAnalyzer:
-    def __init__(self, model_path):
+    def __init__(self, model_path, featurizer=None):
         # Load the model using joblib
 
         # If model file does not exist, train and save it
@@ -57,15 +107,12 @@ class SentimentAnalyzer:
             print("[INFO] Training and saving new model...")
             train_and_save_model()
         self.model = joblib.load(model_path)
-        self.positive_words = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
-        self.negative_words = ["hate", "terrible", "worst", "disappointed", "awful"]
+        # NOTE: Pass SentimentFeaturizer.from_files(...) to use larger lexicons
+        self.featurizer = featurizer or SentimentFeaturizer()
 
     # It allows the instance to be called like a function, like use the prediction method, but with data processing included
     def __call__(self, text):
-        num_words = len(text.split())
-        num_positive_words = sum(word in text.lower() for word in self.positive_words)
-        num_complaints = sum(word in text.lower() for word in self.negative_words)
-        features = [[num_words, num_positive_words, num_complaints]]
+        features = [self.featurizer.featurize(text)]
         
         # Get prediction and confidence score
         prediction = self.model.predict(features)
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, List
+
+
+class Histogram:
+    """
+    Minimal cumulative histogram with fixed upper bounds
+    (the last bucket is +Inf)
+    """
+    def __init__(self, bounds: List[float]):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent inference requests into a single batched call.
+
+    A batch is dispatched when `max_batch_size` items are waiting or when the
+    oldest item has waited `max_wait_ms`, whichever happens first. The batched
+    function receives a list of inputs and must return one result per input,
+    in the same order.
+    """
+    def __init__(self, predict_batch: Callable[[list], list],
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_histogram = Histogram(
+            [0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+        )
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Fail anything still waiting so no request hangs forever
+        while not self.queue.empty():
+            _, future, _ = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        # Block until the first item arrives, then fill the batch until it is
+        # full or the wait budget of the first item runs out
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Drop requests whose caller already gave up (e.g. disconnected)
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter()
+            self.batch_size_histogram.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                self.queue_wait_histogram.observe(dispatched_at - enqueued_at)
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.predict_batch, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self.queue.qsize(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from starlette.responses import JSONResponse
+
+# Limits start at CONCURRENCY_INITIAL_LIMIT and move between the min and max
+CONCURRENCY_INITIAL_LIMIT = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", "8"))
+CONCURRENCY_MIN_LIMIT = int(os.getenv("CONCURRENCY_MIN_LIMIT", "1"))
+CONCURRENCY_MAX_LIMIT = int(os.getenv("CONCURRENCY_MAX_LIMIT", "64"))
+# Latency the limit is tuned for (per route, this is the default)
+CONCURRENCY_TARGET_MS = float(os.getenv("CONCURRENCY_TARGET_MS", "100"))
+# Requests waiting for a slot, and how long each may wait, before a 503
+CONCURRENCY_QUEUE_SIZE = int(os.getenv("CONCURRENCY_QUEUE_SIZE", "32"))
+CONCURRENCY_QUEUE_TIMEOUT_MS = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_MS", "1000"))
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit for one route, adapted with AIMD on observed latency.
+
+    A request that finishes within `target` seconds while the limit is in use
+    raises the limit by 1/limit (about +1 per limit's worth of requests); a
+    slower one multiplies it by `backoff`, at most once per observed latency
+    so a burst of slow responses counts as one signal. Requests over the
+    limit wait in a bounded FIFO queue for at most `queue_timeout` seconds.
+
+    Only used from the event loop, so no locking is needed
+    """
+    def __init__(self, target: float, initial_limit: int = CONCURRENCY_INITIAL_LIMIT,
+                 min_limit: int = CONCURRENCY_MIN_LIMIT, max_limit: int = CONCURRENCY_MAX_LIMIT,
+                 max_queue: int = CONCURRENCY_QUEUE_SIZE,
+                 queue_timeout: float = CONCURRENCY_QUEUE_TIMEOUT_MS / 1000, backoff: float = 0.9):
+        self.target = target
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiters = deque()
+        self.latency = target  # moving average, for Retry-After
+        self._last_decrease = 0.0
+        self.counters = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_queue_timeout": 0}
+
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def retry_after(self) -> int:
+        # Seconds until the queue ahead would drain at the current limit
+        wait = self.latency * (len(self.waiters) + 1) / self.capacity()
+        return max(1, min(30, math.ceil(wait)))
+
+    async def acquire(self):
+        while self.waiters and self.waiters[0].done():
+            self.waiters.popleft()
+        if not self.waiters and self.in_flight < self.capacity():
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise Overloaded("queue_full", self.retry_after())
+
+        self.counters["queued"] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiters.append(future)
+        expire = loop.call_later(self.queue_timeout, self._expire, future)
+        try:
+            # release() hands the slot over by setting the result
+            await future
+        except asyncio.CancelledError:
+            # Client went away; give the slot back if it had just been handed over
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(None)
+            raise
+        finally:
+            expire.cancel()
+        self.counters["admitted"] += 1
+
+    def _expire(self, future):
+        if not future.done():
+            self.counters["shed_queue_timeout"] += 1
+            future.set_exception(Overloaded("queue_timeout", self.retry_after()))
+
+    def release(self, latency):
+        if latency is not None:
+            self._update(latency)
+        self.in_flight -= 1
+        # Hand free slots to the oldest waiters (the limit may also have grown)
+        while self.waiters and self.in_flight < self.capacity():
+            future = self.waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _update(self, latency: float):
+        self.latency = 0.9 * self.latency + 0.1 * latency
+        if latency > self.target:
+            now = time.monotonic()
+            if now - self._last_decrease >= latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif 2 * self.in_flight >= self.limit:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued_now": sum(not future.done() for future in self.waiters),
+            "target_ms": self.target * 1000,
+            "latency_ms": round(self.latency * 1000, 3),
+            **self.counters,
+        }
+
+
+class ConcurrencyLimits:
+    """
+    One AIMDLimiter per limited route (exact request path -> latency target in ms)
+    """
+    def __init__(self, routes: dict, bypass=("/health",), **limiter_options):
+        self.bypass = frozenset(bypass)
+        self.limiters = {path: AIMDLimiter(target_ms / 1000, **limiter_options)
+                         for path, target_ms in routes.items()}
+
+    def get(self, path: str):
+        # Probes are never limited, whatever the route configuration
+        return None if path in self.bypass else self.limiters.get(path)
+
+    def stats(self) -> dict:
+        return {path: limiter.stats() for path, limiter in self.limiters.items()}
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI middleware that admits requests to the limited routes through their
+    AIMDLimiter and answers 503 with Retry-After when the queue overflows.
+    Latency is measured from admission until the response is fully sent
+    """
+    def __init__(self, app, limits: ConcurrencyLimits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            response = JSONResponse(
+                {"detail": "Server overloaded, retry later"}, status_code=503,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            return await response(scope, receive, send)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from typing import Callable
+from fastapi import HTTPException, Request
+
+# Clients send their remaining budget in milliseconds
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+# Upper bound for client budgets
+DEADLINE_MAX_MS = float(os.getenv("DEADLINE_MAX_MS", "30000"))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Absolute point in time (monotonic clock) by which a request must be answered
+    """
+    def __init__(self, budget_s: float, start: float = None):
+        self.budget = budget_s
+        self.expires_at = (time.monotonic() if start is None else start) + budget_s
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def request_deadline(default_ms: float):
+    """
+    Dependency factory: the route's deadline, from the DEADLINE_HEADER budget
+    or `default_ms` when the client does not send one
+    """
+    def dependency(request: Request) -> Deadline:
+        header = request.headers.get(DEADLINE_HEADER)
+        if header is None:
+            return Deadline(default_ms / 1000)
+        try:
+            budget_ms = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} must be a number of milliseconds")
+        if not budget_ms > 0:
+            raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} must be positive")
+        return Deadline(min(budget_ms, DEADLINE_MAX_MS) / 1000)
+    return dependency
+
+
+class DeadlineQueue:
+    """
+    Inference queue where every item carries its Deadline.
+
+    A bounded set of workers runs `predict` in a thread for one item at a
+    time. Items whose deadline already passed, or whose caller stopped
+    waiting, are dropped without running, so a backlog of requests that can
+    no longer be answered in time does not use CPU
+    """
+    def __init__(self, predict: Callable, workers: int = 4):
+        self.predict = predict
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._tasks = []
+        self.counters = {"completed": 0, "dropped_expired": 0, "dropped_abandoned": 0}
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Fail anything still waiting so no request hangs forever
+        while not self.queue.empty():
+            _, _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference queue stopped"))
+
+    async def submit(self, item, deadline: Deadline, timeout: float = None):
+        """
+        Queue `item` and wait for its result for at most `timeout` seconds
+        (default: until the deadline). Raises DeadlineExceeded otherwise
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, deadline, future))
+        try:
+            return await asyncio.wait_for(future, deadline.remaining() if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            # wait_for cancelled the future: a worker that has not picked the
+            # item up yet will skip it
+            raise DeadlineExceeded("Deadline exceeded while waiting for inference")
+
+    async def _run(self):
+        while True:
+            item, deadline, future = await self.queue.get()
+            if future.done():
+                self.counters["dropped_abandoned"] += 1
+                continue
+            if deadline.expired():
+                self.counters["dropped_expired"] += 1
+                future.set_exception(DeadlineExceeded("Deadline expired in the inference queue"))
+                continue
+            try:
+                result = await asyncio.to_thread(self.predict, item)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.counters["completed"] += 1
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queue_depth": self.queue.qsize(), **self.counters}
@@ -0,0 +1,55 @@
+import json
+import os
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Falls back to the json module (arrays go through tolist)
+    orjson = None
+
+# true: build the Pydantic response model again and let FastAPI encode it
+# (the previous path, kept for debugging and before/after comparisons)
+RESPONSE_VALIDATION = os.getenv("RESPONSE_VALIDATION", "false").lower() == "true"
+
+
+def _default(obj):
+    # NumPy values orjson does not serialize natively (string/object arrays,
+    # non-contiguous arrays) and everything for the json module
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class TrustedJSONResponse(Response):
+    """
+    JSON response for content the server built itself (model output), encoded
+    straight to bytes: NumPy arrays included, no Pydantic model and no
+    jsonable_encoder pass. Returning a Response also makes FastAPI skip its
+    own response validation
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def trusted_response(response_model, content: dict):
+    """
+    `content` (plain values and NumPy arrays, with the fields of
+    `response_model`) as a TrustedJSONResponse, or as a validated
+    `response_model` instance when RESPONSE_VALIDATION=true
+    """
+    if RESPONSE_VALIDATION:
+        return response_model(**{key: _default(value) if isinstance(value, (np.ndarray, np.generic)) else value
+                                 for key, value in content.items()})
+    return TrustedJSONResponse(content)
@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from sentiment_model import SentimentAnalyzer, PATH_TO_MODEL
+
+# "thread" runs inference in the calling thread (asyncio.to_thread / anyio
+# threadpool, GIL-bound); "process" runs it in a pool of child processes
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", str(os.cpu_count() or 1)))
+# Seconds a batch may take in process mode (0 = no limit)
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "0"))
+# Size of each preallocated shared memory block; larger batches get their own
+INFERENCE_SLOT_BYTES = int(os.getenv("INFERENCE_SLOT_BYTES", str(1024 * 1024)))
+
+
+def _align(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def _layout(n_texts: int, blob_bytes: int):
+    """
+    Byte offsets of one batch inside a shared memory block:
+    int64 offsets[n+1] | UTF-8 texts | int64 predictions[n] | float64 confidences[n]
+    """
+    blob_start = 8 * (n_texts + 1)
+    predictions_start = _align(blob_start + blob_bytes)
+    confidences_start = predictions_start + 8 * n_texts
+    return blob_start, predictions_start, confidences_start, confidences_start + 8 * n_texts
+
+
+# State of each child process
+_model = None
+_model_path = None
+_blocks = {}
+
+
+def _init_child(model_path):
+    global _model, _model_path
+    _model_path = model_path
+    _model = SentimentAnalyzer(model_path)
+
+
+def _child_ready():
+    return os.getpid(), _model.model_version
+
+
+def _attach(name):
+    # Preallocated slots stay mapped for the life of the child
+    block = _blocks.get(name)
+    if block is None:
+        block = _blocks[name] = shared_memory.SharedMemory(name=name)
+    return block
+
+
+def _score_in_child(name, n_texts, blob_bytes, model_version, deadline, persistent):
+    """
+    Score the texts stored in shared memory block `name` and write the
+    predictions next to them. Returns False if the deadline had already
+    passed, in which case the batch is skipped
+    """
+    global _model
+    if deadline is not None and time.time() > deadline:
+        return False
+    if _model.model_version != model_version:
+        # The parent hot-reloaded the model: load the new artifact once
+        _model = SentimentAnalyzer(_model_path)
+        if _model.model_version != model_version:
+            raise RuntimeError(f"Model artifact changed (expected {model_version}, "
+                               f"found {_model.model_version})")
+
+    block = _attach(name) if persistent else shared_memory.SharedMemory(name=name)
+    try:
+        blob_start, predictions_start, confidences_start, _ = _layout(n_texts, blob_bytes)
+        offsets = np.ndarray((n_texts + 1,), dtype=np.int64, buffer=block.buf)
+        blob = bytes(block.buf[blob_start:blob_start + blob_bytes])
+        texts = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(n_texts)]
+        predictions, confidences = _model.score_texts(texts)
+        np.ndarray((n_texts,), dtype=np.int64, buffer=block.buf,
+                   offset=predictions_start)[:] = predictions
+        np.ndarray((n_texts,), dtype=np.float64, buffer=block.buf,
+                   offset=confidences_start)[:] = confidences
+        # Drop the views before the block can be closed
+        del offsets
+        return True
+    finally:
+        if not persistent:
+            block.close()
+
+
+class InferenceExecutor:
+    """
+    Runs SentimentAnalyzer inference in the calling thread or in a pool of
+    child processes.
+
+    In process mode every child loads the model once (pool initializer).
+    Cache lookups stay in the parent; the texts to score are written as one
+    UTF-8 buffer into a shared memory block and the children write the
+    predictions back into the same block, so no per-text objects are pickled.
+
+    A batch that times out is cancelled if it has not been handed to a child
+    yet, and skipped by the child if it gets there after its deadline. Its
+    shared memory block is only reused once the child is done with it
+    """
+    def __init__(self, mode: str = INFERENCE_EXECUTOR, processes: int = INFERENCE_PROCESSES,
+                 timeout: float = INFERENCE_TIMEOUT_S, model_path=PATH_TO_MODEL,
+                 slot_bytes: int = INFERENCE_SLOT_BYTES):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor: {mode}")
+        self.mode = mode
+        self.processes = max(1, processes)
+        self.timeout = timeout or None
+        self.model_path = model_path
+        self.slot_bytes = slot_bytes
+        self.pool = None
+        self.slots = queue.SimpleQueue()
+        self._blocks = []
+        self._lock = threading.Lock()
+        self.counters = {"batches": 0, "texts": 0, "timed_out": 0, "cancelled": 0,
+                         "skipped_by_child": 0, "oversized": 0}
+
+    def start(self):
+        # Blocks until every child has loaded the model
+        if self.mode != "process" or self.pool is not None:
+            return
+        # NOTE: spawn instead of fork, the server already runs threads
+        self.pool = ProcessPoolExecutor(
+            self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_child,
+            initargs=(str(self.model_path),),
+        )
+        # Two blocks per child so the next batch can be written while one runs
+        for _ in range(2 * self.processes):
+            block = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+            self._blocks.append(block)
+            self.slots.put(block)
+        try:
+            ready = [self.pool.submit(_child_ready) for _ in range(self.processes)]
+            children = {future.result() for future in ready}
+        except Exception:
+            self.stop()
+            raise
+        print(f"[STARTUP] Inference process pool ready ({self.processes} processes, "
+              f"model {children.pop()[1]})")
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self.slots = queue.SimpleQueue()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def predict_batch(self, model, texts, timeout=None):
+        """
+        Same results as model.predict_batch(texts). In process mode raises
+        TimeoutError if the batch takes longer than `timeout` seconds
+        (default: the executor's timeout)
+        """
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["texts"] += len(texts)
+        if self.mode == "thread":
+            return model.predict_batch(texts)
+        timeout = timeout or self.timeout
+        deadline = time.time() + timeout if timeout else None
+        return model.predict_batch(
+            texts, lambda missing: self._score_in_pool(missing, model.model_version, deadline)
+        )
+
+    def _score_in_pool(self, texts, model_version, deadline):
+        encoded = [text.encode() for text in texts]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        blob_bytes = int(offsets[-1])
+        blob_start, predictions_start, confidences_start, size = _layout(len(texts), blob_bytes)
+
+        persistent = size <= self.slot_bytes
+        try:
+            block = self.slots.get_nowait() if persistent else None
+        except queue.Empty:
+            block, persistent = None, False
+        if block is None:
+            # Oversized batch, or every slot is busy: use a block of its own
+            self._count("oversized")
+            block = shared_memory.SharedMemory(create=True, size=size)
+        block.buf[:8 * len(offsets)] = offsets.tobytes()
+        block.buf[blob_start:blob_start + blob_bytes] = b"".join(encoded)
+
+        future = self.pool.submit(_score_in_child, block.name, len(texts), blob_bytes,
+                                  model_version, deadline, persistent)
+        try:
+            completed = future.result(None if deadline is None else max(deadline - time.time(), 0))
+        except TimeoutError:
+            self._count("timed_out")
+            if future.cancel():
+                self._count("cancelled")
+            # A running batch can't be interrupted: its block is given back
+            # (or freed) once the child is done with it
+            future.add_done_callback(lambda done: self._abandoned(done, block, persistent))
+            raise TimeoutError("Inference timed out")
+        except BaseException:
+            self._release(block, persistent)
+            raise
+
+        try:
+            if not completed:
+                # The child got the batch after its deadline and skipped it
+                self._count("skipped_by_child")
+                raise TimeoutError("Inference timed out before the batch started")
+            predictions = np.ndarray((len(texts),), dtype=np.int64, buffer=block.buf,
+                                     offset=predictions_start).copy()
+            confidences = np.ndarray((len(texts),), dtype=np.float64, buffer=block.buf,
+                                     offset=confidences_start).copy()
+            return predictions, confidences
+        finally:
+            self._release(block, persistent)
+
+    def _abandoned(self, future, block, persistent):
+        # Done callback of a batch whose caller already timed out
+        if not future.cancelled() and future.exception() is None and not future.result():
+            self._count("skipped_by_child")
+        self._release(block, persistent)
+
+    def _release(self, block, persistent):
+        if persistent:
+            self.slots.put(block)
+        else:
+            block.close()
+            block.unlink()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "mode": self.mode,
+            "processes": self.processes if self.mode == "process" else 0,
+            "timeout_s": self.timeout,
+            "free_slots": self.slots.qsize(),
+            **counters,
+        }
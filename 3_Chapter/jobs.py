@@ -0,0 +1,283 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List
+
+# Ensure the data directory exists
+Path(__file__).parent.joinpath("data").mkdir(parents=True, exist_ok=True)
+PATH_TO_JOBS_DB = Path(__file__).parent / "data" / "jobs.db"
+# Each process renews the lease of its unfinished jobs; a job whose lease
+# expires (its process died) is marked as failed by any other process
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "30"))
+# How often a stream checks the store for a job run by another worker process
+JOB_POLL_INTERVAL_MS = float(os.getenv("JOB_POLL_INTERVAL_MS", "200"))
+# Finished jobs and their results are deleted this long after they finish
+JOB_RETENTION_S = float(os.getenv("JOB_RETENTION_S", str(24 * 3600)))
+
+FINISHED = ("completed", "failed")
+
+
+class JobStore:
+    """
+    SQLite store for batch job progress and results.
+
+    A single connection is shared by the worker threads and guarded by a lock;
+    WAL mode lets readers page through results while workers are writing.
+    Several worker processes can share the database: every job belongs to
+    the store (process) that created it, while its lease is renewed
+    """
+    def __init__(self, db_path=PATH_TO_JOBS_DB, lease_s: float = JOB_LEASE_S,
+                 retention_s: float = JOB_RETENTION_S):
+        self.owner = uuid.uuid4().hex
+        self.lease_s = lease_s
+        self.retention_s = retention_s
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+            """)
+            # Databases created before leases existed
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            # rowid keeps completion order, which is what the stream follows
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    label TEXT NOT NULL,
+                    confidence REAL NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_results_job_idx ON results (job_id, idx)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at)"
+            )
+        # NOTE: unfinished jobs are not failed here: with several worker
+        # processes they may belong to a sibling that is still running them
+        self.expire_leases()
+
+    def create_job(self, job_id: str, total: int):
+        now = time.time()
+        # A job without texts has nothing to wait for
+        status = "queued" if total else "completed"
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, total, created_at, updated_at, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, total, now, now, self.owner, now + self.lease_s)
+            )
+
+    def renew_leases(self):
+        # Keep this process' unfinished jobs from being taken for abandoned
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time() + self.lease_s, self.owner)
+            )
+
+    def expire_leases(self):
+        # Jobs whose process stopped renewing them will never complete
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by restart', updated_at = ? "
+                "WHERE status IN ('queued', 'running') AND (lease_until IS NULL OR lease_until < ?)",
+                (now, now)
+            )
+
+    def delete_expired(self) -> int:
+        # Finished jobs past their retention, with their results
+        cutoff = time.time() - self.retention_s
+        expired = "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?"
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM results WHERE job_id IN ({expired})", (cutoff,))
+            deleted = self.conn.execute(f"DELETE FROM jobs WHERE id IN ({expired})", (cutoff,)).rowcount
+        return deleted
+
+    def save_results(self, job_id: str, start: int, results: List[dict]) -> dict:
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (job_id, idx, label, confidence) VALUES (?, ?, ?, ?)",
+                [(job_id, start + i, r["label"], r["confidence"]) for i, r in enumerate(results)]
+            )
+            self.conn.execute(
+                "UPDATE jobs SET processed = processed + ?, updated_at = ?, "
+                "status = CASE WHEN processed + ? >= total THEN 'completed' ELSE 'running' END "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (len(results), time.time(), len(results), job_id)
+            )
+        return self.get_job(job_id)
+
+    def fail_job(self, job_id: str, error: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def get_job(self, job_id: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, status, total, processed, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[dict]:
+        # Results page ordered by the position of the text in the request
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT idx AS \"index\", label, confidence FROM results "
+                "WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_results_after(self, job_id: str, after_rowid: int, limit: int = 1000) -> List[dict]:
+        # Results in completion order, used for streaming
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT rowid, idx AS \"index\", label, confidence FROM results "
+                "WHERE job_id = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                (job_id, after_rowid, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JobManager:
+    """
+    Runs batch jobs on a bounded pool of workers.
+
+    Each job is split into chunks that are scored with one vectorized call;
+    up to `workers` chunks (from any job) are processed concurrently. A
+    background task renews the leases of this process' jobs, fails the ones
+    other processes abandoned and deletes finished jobs past their retention
+    """
+    def __init__(self, store: JobStore, predict_batch: Callable[[list], list],
+                 chunk_size: int = 500, workers: int = 4):
+        self.store = store
+        self.predict_batch = predict_batch
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # Signalled every time a job makes progress, so streams can wake up
+        self.progress: dict[str, asyncio.Event] = {}
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintenance()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, texts: List[str]) -> str:
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create_job, job_id, len(texts))
+        if not texts:
+            return job_id
+        self.progress[job_id] = asyncio.Event()
+        for start in range(0, len(texts), self.chunk_size):
+            self.queue.put_nowait((job_id, start, texts[start:start + self.chunk_size]))
+        return job_id
+
+    async def _maintenance(self):
+        # Renew well before the lease runs out
+        while True:
+            await asyncio.sleep(self.store.lease_s / 3)
+            try:
+                await asyncio.to_thread(self.store.renew_leases)
+                await asyncio.to_thread(self.store.expire_leases)
+            except sqlite3.Error as e:
+                print(f"[WARNING] Could not renew job leases: {e}")
+            try:
+                deleted = await asyncio.to_thread(self.store.delete_expired)
+                if deleted:
+                    print(f"[INFO] Deleted {deleted} finished jobs past their retention")
+            except sqlite3.Error as e:
+                print(f"[WARNING] Could not delete expired jobs: {e}")
+
+    def _notify(self, job_id: str, job: dict):
+        event = self.progress.get(job_id)
+        if event is None:
+            return
+        event.set()
+        if job["status"] in FINISHED:
+            self.progress.pop(job_id, None)
+        else:
+            self.progress[job_id] = asyncio.Event()
+
+    async def _worker(self):
+        while True:
+            job_id, start, texts = await self.queue.get()
+            try:
+                job = await asyncio.to_thread(self.store.get_job, job_id)
+                if job is None or job["status"] == "failed":
+                    continue
+                results = await asyncio.to_thread(self.predict_batch, texts)
+                job = await asyncio.to_thread(self.store.save_results, job_id, start, results)
+            except Exception as e:
+                job = {"status": "failed"}
+                try:
+                    await asyncio.to_thread(self.store.fail_job, job_id, f"Error during model inference: {str(e)}")
+                except Exception as store_error:
+                    # The worker must keep serving the queue whatever the store does
+                    print(f"[ERROR] Could not mark job {job_id} as failed: {store_error}")
+            finally:
+                self.queue.task_done()
+            self._notify(job_id, job)
+
+    async def stream_results(self, job_id: str):
+        """
+        Yield results as they are stored, until the job finishes.
+
+        Jobs run by this process wake the stream through their progress
+        event; jobs run by another worker process are polled in the store
+        """
+        last_rowid = 0
+        while True:
+            # Grab the event (or the status) before reading so no progress is missed
+            event = self.progress.get(job_id)
+            job = None if event else await asyncio.to_thread(self.store.get_job, job_id)
+            rows = await asyncio.to_thread(self.store.get_results_after, job_id, last_rowid)
+            if rows:
+                for row in rows:
+                    last_rowid = row.pop("rowid")
+                    yield row
+                continue
+            if event is not None:
+                await event.wait()
+            elif job is None or job["status"] in FINISHED:
+                # Job finished and every result has been sent
+                return
+            else:
+                await asyncio.sleep(JOB_POLL_INTERVAL_MS / 1000)
@@ -1,10 +1,21 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
+import json
 from contextlib import asynccontextmanager
-from sentiment_model import SentimentAnalyzer, initialize_rate_limiter, test_api_key
+from sentiment_model import SentimentAnalyzer, PATH_TO_MODEL, initialize_rate_limiter, test_api_key, verify_api_key
+from prediction_cache import cache_from_env, restore_snapshot, save_snapshot
+from batching import MicroBatcher
+from jobs import JobStore, JobManager
+from prefork import preloaded, memory_usage
+from model_reload import ModelReloader
+from ndjson_stream import DuplexStreamingResponse, score_ndjson
+from inference_executor import InferenceExecutor
+from concurrency_limit import ConcurrencyLimits, ConcurrencyLimitMiddleware, CONCURRENCY_TARGET_MS
+from fast_json import trusted_response
 from typing import List
-from pydantic import BaseModel
+import os
 
 
 # Define request/response models
@@ -19,16 +30,28 @@ class CommentResponse(BaseModel):
     sentiment: str
     confidence: float
     status: str
+    model_version: str
 
 
 def load_model():
     try:
-        sentiment_model = SentimentAnalyzer()
+        # Repeated comments are served from the prediction cache.
+        # Under prefork.py the parent's already loaded instance is reused
+        sentiment_model = preloaded("sentiment_model", lambda: SentimentAnalyzer(cache=cache_from_env()))
         return sentiment_model
     except Exception as e:
         print(f"[ERROR] Failed to load model: {e}")
         return None
 
+
+def predict_with_current_model(texts):
+    # The whole batch is scored by one model instance, which is kept alive
+    # (and counted as in use) until it returns, even if a reload swaps it
+    with app.state.reloader.acquire() as model:
+        # INFERENCE_EXECUTOR=process runs the model in a pool of child processes
+        return app.state.executor.predict_batch(model, texts)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     model = load_model()
@@ -36,15 +59,60 @@ async def lifespan(app: FastAPI):
         raise RuntimeError("Failed to load the sentiment analysis model.")
     
     app.state.model = model
+    restore_snapshot(model.cache)
+    # Hot reload (POST /admin/reload_model or MODEL_WATCH_INTERVAL): the new
+    # model reuses the prediction cache, whose entries are keyed by model version
+    app.state.reloader = ModelReloader(
+        app.state, "model",
+        lambda: SentimentAnalyzer(cache=app.state.model.cache),
+        PATH_TO_MODEL,
+        warmup=lambda new_model: new_model.warmup(),
+    )
+    app.state.reloader.start()
+    # Where inference runs: this thread (default) or a process pool whose
+    # children load the model once (INFERENCE_EXECUTOR / INFERENCE_PROCESSES)
+    app.state.executor = InferenceExecutor()
+    await asyncio.to_thread(app.state.executor.start)
+    # Group concurrent /analyze calls into a single vectorized inference.
+    # Each batch uses whatever model is currently loaded
+    app.state.batcher = MicroBatcher(
+        predict_with_current_model,
+        max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "2")),
+    )
+    app.state.batcher.start()
+    # Batch jobs are chunked, scored by a bounded pool of workers and
+    # persisted to SQLite so results can be fetched later
+    app.state.jobs = JobManager(
+        JobStore(),
+        predict_with_current_model,
+        chunk_size=int(os.getenv("JOB_CHUNK_SIZE", "500")),
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+    )
+    app.state.jobs.start()
     initialize_rate_limiter(requests_per_minute=3)
     print("[STARTUP] ML API with rate limiting is ready.")
     # This indicate to FastAPI that the startup tasks are done
     yield
     # The code after yield is executed during shutdown
     print("[EXIT] Closing ML API...")
+    save_snapshot(app.state.model.cache)
+    await app.state.reloader.stop()
+    await app.state.batcher.stop()
+    await app.state.jobs.stop()
+    app.state.jobs.store.close()
+    await asyncio.to_thread(app.state.executor.stop)
 
 app = FastAPI(title="Sentiment Analysis API", lifespan=lifespan)
 
+# Adaptive in-flight limits for the inference routes, overflow gets a 503 with
+# Retry-After. Streams last as long as the upload, so they get their own target
+concurrency = ConcurrencyLimits({
+    "/analyze": CONCURRENCY_TARGET_MS,
+    "/analyze/stream": float(os.getenv("CONCURRENCY_STREAM_TARGET_MS", "30000")),
+})
+app.add_middleware(ConcurrencyLimitMiddleware, limits=concurrency)
+
 # Create async endpoint at /analyze route
 @app.post("/analyze")
 # Write an asynchronous function to process review's text
@@ -66,15 +134,23 @@ async def analyze_review(review: CommentRequest,
         )
     
     try:
-        # Run the model in a separate thread to avoid any event loop blockage
+        # Queue the text for the micro-batcher, which runs the model in a separate
+        # thread (asyncio.to_thread) to avoid any event loop blockage
         # NOTE: If the __call__ method in SentimentAnalyzer is not async, use asyncio.to_thread
         # but if the __call__ method is async, use await directly
-        result = await asyncio.to_thread(app.state.model, review.text)
-        return CommentResponse(
-            text=review.text,
-            sentiment=result["label"],
-            confidence=result["confidence"],
-            status="success"
+        result = await app.state.batcher.submit(review.text)
+        return trusted_response(CommentResponse, {
+            "text": review.text,
+            "sentiment": result["label"],
+            "confidence": result["confidence"],
+            "status": "success",
+            "model_version": result["model_version"]
+        })
+    except TimeoutError:
+        # Only raised in process mode, with INFERENCE_TIMEOUT_S set
+        raise HTTPException(
+            status_code=504,
+            detail="Model inference timed out"
         )
     except Exception as e:
         raise HTTPException(
@@ -83,11 +159,29 @@ async def analyze_review(review: CommentRequest,
         )
 
 
-# Create a background task dependency
-@app.post("/analyze_batch")
+# Score an NDJSON upload ({"text": ...} or a JSON string per line) while it is
+# being received; results are streamed back in input order, one line per input
+@app.post("/analyze/stream")
+async def analyze_stream(request: Request, api_key: str = Depends(test_api_key)):
+
+    if app.state.model is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+
+    # NOTE: request.stream() is consumed by the response generator, so only one
+    # chunk of texts is held in memory regardless of the upload size
+    return DuplexStreamingResponse(
+        score_ndjson(request.stream(), predict_with_current_model),
+        media_type="application/x-ndjson"
+    )
+
+
+# Submit a batch job; the texts are processed in the background by the job workers
+@app.post("/analyze_batch", status_code=202)
 async def analyze_batch(
     reviews: Reviews,
-    background_tasks: BackgroundTasks,
     api_key: str = Depends(test_api_key)
 ):
     
@@ -97,26 +191,104 @@ async def analyze_batch(
             detail="Model not loaded"
         )
 
-    async def process_reviews(texts: List[str]):
-        for text in texts:
-
-            if not text.strip():
-                raise HTTPException(
-                    status_code=400,
-                    detail="Empty text provided"
-                )
-            
-            try:
-                result = await asyncio.to_thread(app.state.model, text)
-                print(f"Processed: {result['label']}")
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error during model inference: {str(e)}"
-                )
-    # Add the task of analysing reviews' texts to the background
-    background_tasks.add_task(process_reviews, reviews.texts)
-    return {"message": "Processing started"}
+    # Validate before accepting the job, so the client actually sees the error
+    if not reviews.texts:
+        raise HTTPException(
+            status_code=400,
+            detail="No texts provided"
+        )
+    empty = [i for i, text in enumerate(reviews.texts) if not text.strip()]
+    if empty:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Empty text provided at positions {empty[:10]}"
+        )
+
+    job_id = await app.state.jobs.submit(reviews.texts)
+    return {"message": "Processing started", "job_id": job_id, "total": len(reviews.texts)}
+
+
+# Job status with a page of results ordered by the position of each text
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    # Polling only checks the API key, it does not count towards the rate limit
+    api_key: str = Depends(verify_api_key)
+):
+    job = await asyncio.to_thread(app.state.jobs.store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    results = await asyncio.to_thread(app.state.jobs.store.get_results, job_id, offset, limit)
+    return {
+        **job,
+        "results": results,
+        "next_offset": results[-1]["index"] + 1 if len(results) == limit else None
+    }
+
+
+# Stream results as newline-delimited JSON while the job is running
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    job = await asyncio.to_thread(app.state.jobs.store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def ndjson():
+        async for result in app.state.jobs.stream_results(job_id):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+# Batch-size and queue-wait histograms used to tune BATCH_MAX_SIZE / BATCH_MAX_WAIT_MS
+@app.get("/metrics/batching")
+async def batching_metrics():
+    return app.state.batcher.stats()
+
+
+# Inference executor mode and counters (timed out, cancelled, skipped batches)
+@app.get("/metrics/executor")
+async def executor_metrics():
+    return app.state.executor.stats()
+
+
+# Current limit, in-flight, queued and shed requests per limited route
+@app.get("/metrics/concurrency")
+async def concurrency_metrics():
+    return concurrency.stats()
+
+
+# Prediction cache counters (hits, misses, evictions, ...)
+@app.get("/metrics/cache")
+async def cache_metrics():
+    cache = app.state.model.cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+# Load, warm up and swap in the model artifact currently on disk
+@app.post("/admin/reload_model")
+async def reload_model(api_key: str = Depends(verify_api_key)):
+    try:
+        return await app.state.reloader.reload()
+    except Exception as e:
+        # The previous model keeps serving
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading model: {str(e)}"
+        )
+
+
+@app.get("/admin/model")
+async def model_status(api_key: str = Depends(verify_api_key)):
+    return app.state.reloader.stats()
+
+
+@app.get("/metrics/memory")
+async def memory_metrics():
+    # Private (uss) vs shared pages of this worker, see prefork.py
+    return {"pid": os.getpid(), **memory_usage()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -134,3 +306,18 @@ if __name__ == "__main__":
 #   -H "X-API-Key: your_secret_key" \
 #   -H "Content-Type: application/json" \
 #   -d '{"texts": ["I love this product", "I did not like it", "It is acceptable"]}'
+
+# curl -X GET "http://localhost:8080/jobs/<job_id>?offset=0&limit=100" -H "X-API-Key: your_secret_key"
+
+# curl -N -X GET http://localhost:8080/jobs/<job_id>/stream -H "X-API-Key: your_secret_key"
+
+# printf '{"text": "I love it"}\n"Terrible"\n' | curl -N -X POST http://localhost:8080/analyze/stream \
+#   -H "X-API-Key: your_secret_key" -H "Content-Type: application/x-ndjson" --data-binary @-
+
+# curl -X GET http://localhost:8080/metrics/batching
+# curl -X GET http://localhost:8080/metrics/cache
+# curl -X GET http://localhost:8080/metrics/executor
+# curl -X GET http://localhost:8080/metrics/concurrency
+# curl -X GET http://localhost:8080/metrics/memory
+
+# curl -X POST http://localhost:8080/admin/reload_model -H "X-API-Key: your_secret_key"
@@ -1,4 +1,5 @@
 from sentiment_model import SentimentAnalyzer,initialize_rate_limiter, test_api_key
+from prediction_cache import cache_from_env, restore_snapshot, save_snapshot
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from pydantic import BaseModel
@@ -17,7 +18,8 @@ class CommentResponse(BaseModel):
 
 def load_model():
     try:
-        sentiment_model = SentimentAnalyzer()
+        # Repeated comments are served from the prediction cache
+        sentiment_model = SentimentAnalyzer(cache=cache_from_env())
         return sentiment_model
     except Exception as e:
         print(f"[ERROR] Failed to load model: {e}")
@@ -30,12 +32,14 @@ async def lifespan(app: FastAPI):
         raise RuntimeError("Failed to load the sentiment analysis model.")
     
     app.state.model = model
+    restore_snapshot(model.cache)
     initialize_rate_limiter(requests_per_minute=3)
     print("[STARTUP] ML API with rate limiting is ready.")
     # This indicate to FastAPI that the startup tasks are done
     yield
     # The code after yield is executed during shutdown
     print("[EXIT] Closing ML API...")
+    save_snapshot(app.state.model.cache)
 
 
 app = FastAPI(title="Sentiment Analysis API", lifespan=lifespan)
@@ -1,9 +1,21 @@
-import asyncio
+import os
+import time
 from fastapi import FastAPI, HTTPException, Depends
 from sentiment_model import SentimentAnalyzer, initialize_rate_limiter, test_api_key
+from prediction_cache import cache_from_env, restore_snapshot, save_snapshot
+from deadlines import Deadline, DeadlineExceeded, DeadlineQueue, request_deadline
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 
+# Budget of /analyze_reviews when the client sends no X-Request-Timeout-Ms header
+ANALYZE_DEADLINE_MS = float(os.getenv("ANALYZE_DEADLINE_MS", "5000"))
+# Time kept aside to answer with the keyword heuristic instead of a 408
+# (DEGRADED_RESPONSES=false always answers 408 when the budget runs out)
+DEGRADED_RESERVE_MS = float(os.getenv("DEGRADED_RESERVE_MS", "50"))
+DEGRADED_RESPONSES = os.getenv("DEGRADED_RESPONSES", "true").lower() == "true"
+# Extra seconds per inference, to simulate a slow CPU-bound model
+SIMULATED_DELAY_S = float(os.getenv("SIMULATED_DELAY_S", "0"))
+
 # Define request/response models
 class CommentRequest(BaseModel):
     text: str
@@ -13,17 +25,26 @@ class CommentResponse(BaseModel):
     sentiment: str
     confidence: float
     status: str
+    degraded: bool = False
 
 
 def load_model():
     try:
-        sentiment_model = SentimentAnalyzer()
+        # Repeated comments are served from the prediction cache
+        sentiment_model = SentimentAnalyzer(cache=cache_from_env())
         return sentiment_model
     except Exception as e:
         print(f"[ERROR] Failed to load model: {e}")
         return None
 
 
+def predict(text):
+    # Runs in a DeadlineQueue worker thread
+    if SIMULATED_DELAY_S:
+        time.sleep(SIMULATED_DELAY_S)
+    return app.state.model(text)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     model = load_model()
@@ -31,19 +52,26 @@ async def lifespan(app: FastAPI):
         raise RuntimeError("Failed to load the sentiment analysis model.")
     
     app.state.model = model
+    restore_snapshot(model.cache)
+    # Inference queue whose items carry their deadline
+    app.state.queue = DeadlineQueue(predict, workers=int(os.getenv("INFERENCE_WORKERS", "4")))
+    app.state.queue.start()
     initialize_rate_limiter(requests_per_minute=3)
     print("[STARTUP] ML API with timeout is ready.")
     # This indicate to FastAPI that the startup tasks are done
     yield
     # The code after yield is executed during shutdown
     print("[EXIT] Closing ML API...")
+    save_snapshot(app.state.model.cache)
+    await app.state.queue.stop()
 
 
 app = FastAPI(title="Sentiment Analysis API", lifespan=lifespan)
 
 @app.post("/analyze_reviews")
 async def analyze_reviews(review: CommentRequest,
-                          api_key: str = Depends(test_api_key)):
+                          api_key: str = Depends(test_api_key),
+                          deadline: Deadline = Depends(request_deadline(ANALYZE_DEADLINE_MS))):
     
     if app.state.model is None:
         raise HTTPException(
@@ -57,23 +85,42 @@ async def analyze_reviews(review: CommentRequest,
             detail="Empty text provided"
         )
 
+    # Wait for the model until only the reserve for the heuristic is left
+    reserve = DEGRADED_RESERVE_MS / 1000 if DEGRADED_RESPONSES else 0
     try:
-        # Set model input and timeout limit
-        async with asyncio.timeout(5):
-            result = await app.state.model.async_call(review.text, sleep=6)
+        # NOTE: the deadline travels with the text, the queue drops it without
+        # running the model if it expires before a worker picks it up
+        result = await app.state.queue.submit(review.text, deadline,
+                                              timeout=deadline.remaining() - reserve)
         return CommentResponse(
             text=review.text,
             sentiment=result["label"],
             confidence=result["confidence"],
             status="success"
-        )    
-    except asyncio.TimeoutError:
-        # Raise HTTP status code for timeout error
-        raise HTTPException(status_code=408, detail="Analysis timed out")
+        )
+    except DeadlineExceeded:
+        if not DEGRADED_RESPONSES:
+            # Raise HTTP status code for timeout error
+            raise HTTPException(status_code=408, detail="Analysis timed out")
+        # Cheap keyword answer within the budget, marked as degraded
+        result = app.state.model.heuristic(review.text)
+        return CommentResponse(
+            text=review.text,
+            sentiment=result["label"],
+            confidence=result["confidence"],
+            status="degraded",
+            degraded=True
+        )
     except Exception as e:
         # Raise HTTP status code for internal error
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-        
+
+
+# Completed vs dropped (expired or abandoned) inference requests
+@app.get("/metrics/deadlines")
+async def deadline_metrics():
+    return app.state.queue.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -84,3 +131,12 @@ if __name__ == "__main__":
 #   -H "X-API-Key: your_secret_key" \
 #   -H "Content-Type: application/json" \
 #   -d '{"text": "This is a test"}'
+
+# curl -X POST \
+#   http://localhost:8080/analyze_reviews \
+#   -H "X-API-Key: your_secret_key" \
+#   -H "X-Request-Timeout-Ms: 200" \
+#   -H "Content-Type: application/json" \
+#   -d '{"text": "I love this, it is fantastic"}'
+
+# curl -X GET http://localhost:8080/metrics/deadlines
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Callable, List
+from starlette.responses import StreamingResponse
+
+# Texts scored per inference call in /analyze/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "256"))
+# A partial chunk is scored once its first line has waited this long, so a
+# client sending few lines (or waiting for results) is not left hanging
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "50"))
+# Longer input lines are reported as errors instead of being buffered
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+
+class LineTooLong(Exception):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = STREAM_MAX_LINE_BYTES):
+    """
+    Split a byte stream into lines without holding more than one line (plus
+    one network chunk) in memory. Oversized lines are skipped and yielded as
+    a LineTooLong instance so the caller can report them
+    """
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in chunk:
+            # Split once per network chunk; the last piece is an incomplete line
+            *lines, buffer = buffer.split(b"\n")
+        else:
+            lines = []
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > max_line_bytes:
+                yield LineTooLong(f"Line longer than {max_line_bytes} bytes")
+                continue
+            yield line
+        if len(buffer) > max_line_bytes:
+            # Drop the partial line now and the rest of it when its newline arrives
+            if not skipping:
+                yield LineTooLong(f"Line longer than {max_line_bytes} bytes")
+            buffer = b""
+            skipping = True
+    if buffer and not skipping:
+        yield buffer
+
+
+def parse_line(line: bytes):
+    """
+    Return the text of one input line ({"text": ...} or a JSON string),
+    or raise ValueError with the reason it can not be scored
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    text = record.get("text") if isinstance(record, dict) else record
+    if not isinstance(text, str):
+        raise ValueError("Each line must be a JSON string or an object with a 'text' string")
+    if not text.strip():
+        raise ValueError("Empty text provided")
+    return text
+
+
+async def score_ndjson(chunks: AsyncIterator[bytes], predict_batch: Callable[[List[str]], List[dict]],
+                       chunk_size: int = STREAM_CHUNK_SIZE, flush_ms: float = STREAM_FLUSH_MS):
+    """
+    Read NDJSON texts, score them `chunk_size` at a time and yield one NDJSON
+    result line per input line, in input order. When no further line arrives
+    within `flush_ms` of the first one waiting, the partial chunk is scored.
+
+    The next chunk is only read once the previous results have been handed
+    to the response, so a slow client slows down reading (backpressure)
+    """
+    loop = asyncio.get_running_loop()
+    index = 0
+    pending = []  # (index, text or error message, is_error)
+    deadline = None  # when the first pending line has waited flush_ms
+
+    async def flush():
+        texts = [text for _, text, is_error in pending if not is_error]
+        results = iter(await asyncio.to_thread(predict_batch, texts) if texts else [])
+        lines = []
+        for i, value, is_error in pending:
+            if is_error:
+                lines.append(json.dumps({"index": i, "error": value}))
+            else:
+                lines.append(json.dumps({"index": i, **next(results)}))
+        pending.clear()
+        return ("\n".join(lines) + "\n").encode()
+
+    lines = iter_lines(chunks)
+    next_line = None
+    try:
+        while True:
+            # The read in progress survives a timeout, so no line is lost
+            if next_line is None:
+                next_line = asyncio.ensure_future(lines.__anext__())
+            timeout = max(0.0, deadline - loop.time()) if pending else None
+            done, _ = await asyncio.wait({next_line}, timeout=timeout)
+            if not done:
+                # The client is not sending more for now: answer what it sent
+                yield await flush()
+                continue
+            line_task, next_line = next_line, None
+            try:
+                line = line_task.result()
+            except StopAsyncIteration:
+                break
+            if not pending:
+                deadline = loop.time() + flush_ms / 1000
+            if isinstance(line, LineTooLong):
+                pending.append((index, str(line), True))
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    pending.append((index, parse_line(line), False))
+                except ValueError as e:
+                    pending.append((index, str(e), True))
+            index += 1
+            if len(pending) >= chunk_size:
+                yield await flush()
+    finally:
+        if next_line is not None:
+            next_line.cancel()
+    if pending:
+        yield await flush()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body is produced while the request body is still
+    being read.
+
+    The stock response listens for client disconnects by consuming
+    `receive()`, which would steal request body chunks from the generator;
+    here the generator itself reads the request, and a disconnect surfaces
+    as an error while reading it
+    """
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code,
+                    "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
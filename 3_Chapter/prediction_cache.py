@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Ensure the data directory exists
+Path(__file__).parent.joinpath("data").mkdir(parents=True, exist_ok=True)
+PATH_TO_CACHE_SNAPSHOT = Path(__file__).parent / "data" / "prediction_cache.json"
+# Set PREDICTION_CACHE_SNAPSHOT=1 to save the cache on shutdown and reload it on startup
+CACHE_SNAPSHOT_ENABLED = os.getenv("PREDICTION_CACHE_SNAPSHOT", "0") == "1"
+
+
+def normalize_text(text: str) -> str:
+    # The sentiment features only depend on the lowercased, whitespace-split
+    # text, so texts that normalize the same always get the same prediction
+    return " ".join(text.lower().split())
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache for prediction results.
+
+    Entries are keyed on (model_version, normalized text) and evicted in
+    least-recently-used order once `max_entries` or `max_bytes` is exceeded.
+    Expired entries are dropped when they are read
+    """
+    def __init__(self, max_entries: int = 100_000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # key -> (result, expires_at (wall clock, so snapshots survive restarts), size)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _size(key) -> int:
+        # Approximate footprint: the text dominates, results are small dicts
+        return sys.getsizeof(key[1]) + 200
+
+    def get(self, model_version: str, text: str):
+        key = (model_version, normalize_text(text))
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            result, expires_at, size = entry
+            if expires_at <= now:
+                del self.entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, model_version: str, text: str, result: dict, expires_at: float = None):
+        key = (model_version, normalize_text(text))
+        size = self._size(key)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self.entries[key] = (result, expires_at or time.time() + self.ttl, size)
+            self.bytes += size
+            while self.entries and (len(self.entries) > self.max_entries
+                                    or self.bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def save(self, path=PATH_TO_CACHE_SNAPSHOT):
+        # Snapshot the live entries (oldest first, so LRU order is restored on load)
+        now = time.time()
+        with self.lock:
+            entries = [
+                [model_version, text, result, expires_at]
+                for (model_version, text), (result, expires_at, _) in self.entries.items()
+                if expires_at > now
+            ]
+        tmp_path = Path(path).with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        tmp_path.replace(path)
+        return len(entries)
+
+    def load(self, path=PATH_TO_CACHE_SNAPSHOT):
+        if not Path(path).is_file():
+            return 0
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        now = time.time()
+        loaded = 0
+        for model_version, text, result, expires_at in entries:
+            if expires_at > now:
+                self.put(model_version, text, result, expires_at=expires_at)
+                loaded += 1
+        return loaded
+
+
+def cache_from_env() -> PredictionCache:
+    # PREDICTION_CACHE_SIZE=0 disables the cache
+    max_entries = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+    if max_entries <= 0:
+        return None
+    return PredictionCache(
+        max_entries=max_entries,
+        max_bytes=int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+    )
+
+
+def restore_snapshot(cache: PredictionCache):
+    # Called on lifespan startup so a restart does not begin with a cold cache
+    if cache is not None and CACHE_SNAPSHOT_ENABLED:
+        print(f"[STARTUP] Restored {cache.load()} cached predictions.")
+
+
+def save_snapshot(cache: PredictionCache):
+    # Called on lifespan shutdown
+    if cache is not None and CACHE_SNAPSHOT_ENABLED:
+        print(f"[EXIT] Saved {cache.save()} cached predictions.")
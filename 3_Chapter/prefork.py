@@ -0,0 +1,205 @@
+"""
+Pre-fork server that loads the model once and shares it with every worker.
+
+The parent imports the app, calls its `load_model()` and freezes the loaded
+objects out of the garbage collector before forking, so the model pages stay
+shared copy-on-write instead of being duplicated by N independent
+`joblib.load` calls. With MODEL_MMAP=1 (or --mmap) artifacts are loaded from
+an uncompressed copy with `mmap_mode="r"`, so NumPy arrays are mapped from
+the page cache instead of being decompressed into private memory.
+
+Usage:
+    python prefork.py main_async_api:app --workers 4 --port 8080 --mmap
+"""
+import argparse
+import gc
+import importlib
+import os
+import random
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+import joblib
+
+# Set MODEL_MMAP=1 to memory-map model arrays (also enabled by --mmap)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "0") == "1"
+
+# Objects returned by load_model() in the parent, reused by the forked workers
+_preloaded = {}
+_preloading = False
+
+
+def load_artifact(path, mmap=None):
+    """
+    joblib.load with optional memory mapping.
+
+    Compressed (or plain pickle) artifacts can not be mapped, so they are
+    re-dumped once without compression next to the original (<name>.mmap)
+    and that copy is loaded with mmap_mode="r"
+    """
+    path = Path(path)
+    if not (MODEL_MMAP if mmap is None else mmap):
+        return joblib.load(path)
+    mmap_path = path.with_name(path.name + ".mmap")
+    if not mmap_path.is_file() or mmap_path.stat().st_mtime < path.stat().st_mtime:
+        # A temporary file of its own per process, so workers writing the
+        # copy at the same time never replace it with a half-written file
+        with tempfile.NamedTemporaryFile(dir=mmap_path.parent, prefix=mmap_path.name, delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            joblib.dump(joblib.load(path), tmp_path, compress=0)
+            os.replace(tmp_path, mmap_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        print(f"[INFO] Wrote uncompressed copy of {path.name} for memory mapping.")
+    return joblib.load(mmap_path, mmap_mode="r")
+
+
+def preloaded(key: str, loader):
+    """
+    Return the object the pre-fork parent already loaded under `key`,
+    or call `loader()` (and keep the result when running in the parent)
+    """
+    if key in _preloaded:
+        return _preloaded[key]
+    value = loader()
+    if _preloading:
+        _preloaded[key] = value
+    return value
+
+
+def memory_usage(pid: int = None) -> dict:
+    """
+    RSS, PSS and USS (private pages) of a process in bytes, from
+    /proc/<pid>/smaps_rollup (Linux only)
+    """
+    fields = {}
+    with open(f"/proc/{pid or os.getpid()}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def report_memory(workers):
+    mib = 1024 * 1024
+    for name, pid in [("parent", os.getpid())] + [("worker", pid) for pid in workers]:
+        try:
+            usage = memory_usage(pid)
+        except OSError:
+            continue
+        print(f"[MEMORY] {name} pid={pid} rss={usage['rss'] / mib:.1f}MiB "
+              f"uss={usage['uss'] / mib:.1f}MiB pss={usage['pss'] / mib:.1f}MiB "
+              f"shared={usage['shared'] / mib:.1f}MiB")
+
+
+def _run_worker(app, sock: socket.socket):
+    import uvicorn
+
+    # Let uvicorn install its own graceful shutdown handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Forked workers would otherwise share the parent's random state
+    random.seed()
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def serve(app_path: str, workers: int = 2, host: str = "0.0.0.0", port: int = 8080,
+          memory_report_interval: float = 60.0):
+    global _preloading
+    module_name, app_name = app_path.split(":")
+
+    # Load the model in the parent; the app's lifespan picks it up in each worker
+    _preloading = True
+    module = importlib.import_module(module_name)
+    if hasattr(module, "load_model"):
+        module.load_model()
+    _preloading = False
+    app = getattr(module, app_name)
+    print(f"[STARTUP] Preloaded {sorted(_preloaded)} in parent pid={os.getpid()}.")
+
+    # Move everything loaded so far to the permanent generation: collections in
+    # the workers then never write to (and un-share) the model's object headers
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"[STARTUP] Serving {app_path} on {host}:{port} with {workers} workers.")
+
+    next_report = time.monotonic() + min(5.0, memory_report_interval)
+    while not stopping:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid in children:
+            children.discard(pid)
+            print(f"[ERROR] Worker {pid} exited with status {status}, restarting.")
+            spawn()
+            continue
+        if memory_report_interval > 0 and time.monotonic() >= next_report:
+            report_memory(sorted(children))
+            next_report = time.monotonic() + memory_report_interval
+        time.sleep(0.2)
+
+    print("[EXIT] Stopping workers...")
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+
+
+def main():
+    global MODEL_MMAP
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("app", help="module:attribute, e.g. main_async_api:app")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--mmap", action="store_true", help="Memory-map model arrays")
+    parser.add_argument("--memory-report-interval", type=float, default=60.0,
+                        help="Seconds between per-worker memory reports (0 disables)")
+    args = parser.parse_args()
+    if args.mmap:
+        MODEL_MMAP = True
+    serve(args.app, args.workers, args.host, args.port, args.memory_report_interval)
+
+
+if __name__ == "__main__":
+    # NOTE: Run main() from the imported module, not from __main__, so the
+    # app's `from prefork import ...` sees the same preloaded state
+    import prefork
+    prefork.main()
@@ -0,0 +1,518 @@
+import hashlib
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the local and redis backends are available
+    fcntl = None
+
+# Algorithm used by initialize_rate_limiter: sliding_window, token_bucket or gcra
+RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "sliding_window")
+# Where the counters live: local (per process), shared (all workers on the
+# host, through an mmap'd file) or redis (any server speaking the Redis protocol)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+# Shared backend file. By default one per namespace and limit, so apps with
+# different limits never read each other's buckets; apps sharing a limit
+# (and namespace) share their counters
+RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH")
+RATE_LIMIT_NAMESPACE = os.getenv("RATE_LIMIT_NAMESPACE", "fastapi")
+# /dev/shm is memory backed and cleared on reboot, which also resets the
+# monotonic timestamps stored in the file
+RATE_LIMIT_SHARED_DIR = Path("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class RateLimiter(ABC):
+    """
+    Base class for constant-time, per-key rate limiters.
+
+    State is a small fixed-size list per key, kept in an OrderedDict in
+    last-access order. Every call evicts a few of the least recently used
+    keys once their state is equivalent to a fresh key, so idle keys do not
+    accumulate. Calls are guarded by a lock because the sync `test_api_key`
+    dependency runs in FastAPI's threadpool
+    """
+    # Maximum number of idle keys evicted per call (keeps each call O(1))
+    max_evictions = 8
+
+    def __init__(self, requests_per_minute: int = 10, period: float = 60.0,
+                 clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.period = period
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.states = OrderedDict()
+
+    def __len__(self):
+        return len(self.states)
+
+    def is_rate_limited(self, api_key: str) -> tuple[bool, int]:
+        """
+        Check if the request should be rate limited
+        Returns (is_limited, requests_remaining)
+        """
+        now = self.clock()
+        with self.lock:
+            state = self._get_state(api_key, now)
+            result = self._check(state, now)
+            self._evict(now)
+        return result
+
+    def _get_state(self, api_key: str, now: float) -> list:
+        # Called with the lock held; marks the key as the most recently used
+        state = self.states.get(api_key)
+        if state is None:
+            state = self.states[api_key] = self._new_state(now)
+        else:
+            self.states.move_to_end(api_key)
+        return state
+
+    def _evict(self, now: float):
+        # The front of the OrderedDict holds the least recently used keys
+        for _ in range(self.max_evictions):
+            if len(self.states) <= 1:
+                return
+            key = next(iter(self.states))
+            if not self._is_idle(self.states[key], now):
+                return
+            self._evicted(key, self.states.pop(key), now)
+
+    def _evicted(self, key: str, state: list, now: float):
+        """Called with the lock held for every evicted key"""
+
+    @abstractmethod
+    def _new_state(self, now: float) -> list:
+        """State of a key seen for the first time"""
+
+    @abstractmethod
+    def _check(self, state: list, now: float) -> tuple[bool, int]:
+        """Count one request against `state`: (is_limited, requests_remaining)"""
+
+    @abstractmethod
+    def _is_idle(self, state: list, now: float) -> bool:
+        """True when `state` is equivalent to a fresh key and can be evicted"""
+
+
+class TokenBucketLimiter(RateLimiter):
+    """
+    Bucket of `requests_per_minute` tokens refilled continuously.
+    State: [tokens, last_refill]
+    """
+    def __init__(self, requests_per_minute: int = 10, period: float = 60.0,
+                 clock=time.monotonic):
+        super().__init__(requests_per_minute, period, clock)
+        self.capacity = float(requests_per_minute)
+        self.refill_rate = requests_per_minute / period
+
+    def _new_state(self, now):
+        return [self.capacity, now]
+
+    def _check(self, state, now):
+        tokens = min(self.capacity, state[0] + (now - state[1]) * self.refill_rate)
+        state[1] = now
+        if tokens < 1:
+            state[0] = tokens
+            return True, 0
+        state[0] = tokens - 1
+        return False, int(state[0])
+
+    def _is_idle(self, state, now):
+        # A full bucket is the same as a brand new key
+        return state[0] + (now - state[1]) * self.refill_rate >= self.capacity
+
+
+class GCRALimiter(RateLimiter):
+    """
+    Generic Cell Rate Algorithm: one request every `period / requests_per_minute`
+    seconds with a burst of up to `requests_per_minute` requests.
+    State: [theoretical_arrival_time]
+    """
+    def __init__(self, requests_per_minute: int = 10, period: float = 60.0,
+                 clock=time.monotonic):
+        super().__init__(requests_per_minute, period, clock)
+        self.emission_interval = period / requests_per_minute
+        self.burst_tolerance = self.emission_interval * (requests_per_minute - 1)
+
+    def _new_state(self, now):
+        return [now]
+
+    def _check(self, state, now):
+        tat = max(state[0], now)
+        if tat - now > self.burst_tolerance + 1e-9:
+            return True, 0
+        state[0] = tat + self.emission_interval
+        remaining = (self.burst_tolerance - (state[0] - now)) / self.emission_interval + 1
+        return False, max(0, int(remaining + 1e-9))
+
+    def _is_idle(self, state, now):
+        return state[0] <= now
+
+
+class SlidingWindowCounterLimiter(RateLimiter):
+    """
+    Approximates a sliding window with the counts of the current and previous
+    fixed windows, weighting the previous one by how much of it still overlaps.
+    State: [window_index, current_count, previous_count]
+    """
+    def _new_state(self, now):
+        return [int(now // self.period), 0, 0]
+
+    def _check(self, state, now):
+        window = int(now // self.period)
+        if window != state[0]:
+            # Roll the windows forward (anything older than one window is gone)
+            state[2] = state[1] if window == state[0] + 1 else 0
+            state[1] = 0
+            state[0] = window
+        overlap = 1 - (now - window * self.period) / self.period
+        estimate = state[2] * overlap + state[1]
+        if estimate >= self.requests_per_minute:
+            return True, 0
+        state[1] += 1
+        return False, max(0, int(self.requests_per_minute - estimate - 1))
+
+    def _is_idle(self, state, now):
+        return int(now // self.period) >= state[0] + 2
+
+
+def _stable_hash(key: str) -> int:
+    # hash() is randomized per process, so workers need a stable hash instead
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return value or 1  # 0 marks an empty slot
+
+
+class SharedTokenBuckets:
+    """
+    Token buckets stored in an mmap'd file shared by every worker on a host.
+
+    The file is a header with the bucket capacity, refill rate and table
+    size, followed by a fixed-size open-addressing table of (key hash,
+    tokens, last refill) slots; a file created for another limit is refused.
+    Updates take an exclusive flock on the file (plus a thread lock, since
+    flock does not exclude threads sharing the descriptor), so a
+    read-modify-write is atomic across processes. Slots whose bucket has
+    refilled completely are reused, which bounds the memory to the file size
+    """
+    HEADER = struct.Struct("<8sddQ")
+    MAGIC = b"RLBUCKET"
+    SLOT = struct.Struct("<Qdd")
+    MAX_PROBES = 16
+
+    def __init__(self, requests_per_minute: int, period: float = 60.0,
+                 path: str = None, slots: int = 65536, clock=time.monotonic):
+        if fcntl is None:
+            raise RuntimeError("The shared rate limit backend requires fcntl (POSIX only)")
+        self.capacity = float(requests_per_minute)
+        self.refill_rate = requests_per_minute / period
+        self.slots = slots
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.path = path or RATE_LIMIT_SHARED_PATH or str(
+            RATE_LIMIT_SHARED_DIR / f"{RATE_LIMIT_NAMESPACE}_rate_limit_{requests_per_minute}_per_{period:g}s.bin"
+        )
+        size = self.HEADER.size + self.SLOT.size * slots
+        header = (self.MAGIC, self.capacity, self.refill_rate, slots)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Size the file and write the header once; every worker maps the same pages
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size < size:
+                os.ftruncate(self.fd, size)
+            self.map = mmap.mmap(self.fd, size)
+            found = self.HEADER.unpack_from(self.map, 0)
+            if found[0] == bytes(len(self.MAGIC)):
+                self.HEADER.pack_into(self.map, 0, *header)
+                found = header
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        if found != header:
+            self.close()
+            raise ValueError(
+                f"{self.path} holds rate limit buckets for another limit; "
+                "set RATE_LIMIT_SHARED_PATH or RATE_LIMIT_NAMESPACE per app"
+            )
+
+    def _find_slot(self, key_hash: int, now: float) -> tuple[int, bool]:
+        # Returns (offset, found); prefers the key's own slot, then an empty
+        # or fully refilled slot, then the least recently used one
+        start = key_hash % self.slots
+        reusable = None
+        oldest, oldest_time = None, float("inf")
+        for probe in range(self.MAX_PROBES):
+            offset = self.HEADER.size + ((start + probe) % self.slots) * self.SLOT.size
+            slot_hash, tokens, last = self.SLOT.unpack_from(self.map, offset)
+            if slot_hash == key_hash:
+                return offset, True
+            if reusable is None and (
+                    slot_hash == 0
+                    or tokens + (now - last) * self.refill_rate >= self.capacity):
+                reusable = offset
+            if last < oldest_time:
+                oldest, oldest_time = offset, last
+        return (reusable if reusable is not None else oldest), False
+
+    def acquire(self, key: str, tokens: int) -> tuple[int, int]:
+        """
+        Take up to `tokens` tokens from the key's bucket
+        Returns (granted, tokens_left_in_bucket)
+        """
+        key_hash = _stable_hash(key)
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                now = self.clock()
+                offset, found = self._find_slot(key_hash, now)
+                if found:
+                    _, available, last = self.SLOT.unpack_from(self.map, offset)
+                    available = min(self.capacity, available + (now - last) * self.refill_rate)
+                else:
+                    available = self.capacity
+                granted = min(tokens, int(available))
+                available -= granted
+                self.SLOT.pack_into(self.map, offset, key_hash, available, now)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return granted, int(available)
+
+    def release(self, key: str, tokens: int, age: float = 0.0):
+        """
+        Give back `tokens` leased `age` seconds ago that were not used
+        (the bucket never goes over its capacity)
+        """
+        key_hash = _stable_hash(key)
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                now = self.clock()
+                offset, found = self._find_slot(key_hash, now)
+                # A slot taken over by another key means the bucket was full anyway
+                if found:
+                    _, available, last = self.SLOT.unpack_from(self.map, offset)
+                    available = min(self.capacity, available + (now - last) * self.refill_rate + tokens)
+                    self.SLOT.pack_into(self.map, offset, key_hash, available, now)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+class RedisFixedWindow:
+    """
+    Fixed-window counters kept in a server speaking the Redis protocol
+    (Redis, Valkey, KeyDB, ...). Only INCRBY and EXPIRE are used, pipelined
+    in a single round trip, so any compatible stand-in works
+    """
+    def __init__(self, requests_per_minute: int, period: float = 60.0,
+                 url: str = REDIS_URL, prefix: str = "ratelimit", timeout: float = 0.5):
+        self.limit = requests_per_minute
+        self.period = period
+        self.prefix = prefix
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sock = None
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"-":
+            raise RuntimeError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"$":
+            length = int(payload)
+            return None if length < 0 else self.reader.read(length + 2)[:-2]
+        raise RuntimeError(f"Unexpected reply: {line!r}")
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.reader = self.sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(self._encode("AUTH", self.password))
+        if self.db:
+            setup.append(self._encode("SELECT", self.db))
+        if setup:
+            self.sock.sendall(b"".join(setup))
+            for _ in setup:
+                self._read_reply()
+
+    def _close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def acquire(self, key: str, tokens: int) -> tuple[int, int]:
+        """
+        Take up to `tokens` requests from the key's current window
+        Returns (granted, requests_left_in_window)
+        """
+        window = int(time.time() // self.period)
+        redis_key = f"{self.prefix}:{key}:{window}"
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self._connect()
+                self.sock.sendall(
+                    self._encode("INCRBY", redis_key, tokens)
+                    + self._encode("EXPIRE", redis_key, int(self.period * 2))
+                )
+                used = self._read_reply()
+                self._read_reply()
+            except (OSError, RuntimeError) as e:
+                # Fail open: an unreachable limiter should not take the API down
+                self._close()
+                print(f"[WARNING] Redis rate limit backend unavailable: {e}")
+                return tokens, self.limit
+        granted = max(0, min(tokens, self.limit - (used - tokens)))
+        return granted, max(0, self.limit - used)
+
+    def release(self, key: str, tokens: int, age: float = 0.0):
+        """
+        Give back `tokens` leased `age` seconds ago that were not used
+        """
+        now = time.time()
+        window = int(now // self.period)
+        if int((now - age) // self.period) != window:
+            # The lease's window is over, its count no longer matters
+            return
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self._connect()
+                self.sock.sendall(self._encode("DECRBY", f"{self.prefix}:{key}:{window}", tokens))
+                self._read_reply()
+            except (OSError, RuntimeError) as e:
+                self._close()
+                print(f"[WARNING] Redis rate limit backend unavailable: {e}")
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+class LeasingRateLimiter(RateLimiter):
+    """
+    Rate limiter whose counters live in a backend shared by every worker.
+
+    Each worker leases tokens from the backend in blocks of `lease_size` and
+    spends them locally, so most calls never touch shared state. Leases
+    expire after `lease_ttl` seconds so unused tokens do not linger in one
+    worker: what is left of an expired (or evicted) lease is given back to
+    the backend. With small limits the lease size drops to 1 to stay exact.
+    Local state: [leased_tokens, lease_expiry, backend_remaining]
+    """
+    def __init__(self, backend, requests_per_minute: int = 10, period: float = 60.0,
+                 lease_size: int = None, lease_ttl: float = 1.0, clock=time.monotonic):
+        super().__init__(requests_per_minute, period, clock)
+        self.backend = backend
+        self.lease_size = lease_size or max(1, requests_per_minute // 100)
+        self.lease_ttl = lease_ttl
+        # (key, tokens, lease age) to give back, collected under the lock and
+        # sent to the backend outside it
+        self.returns = []
+
+    def _new_state(self, now):
+        return [0, now, self.requests_per_minute]
+
+    def is_rate_limited(self, api_key: str) -> tuple[bool, int]:
+        now = self.clock()
+        with self.lock:
+            state = self._get_state(api_key, now)
+            if now >= state[1]:
+                self._give_back(api_key, state, now)
+            limited, remaining = self._check(state, now)
+            self._evict(now)
+            returns, self.returns = self.returns, []
+        for key, tokens, age in returns:
+            self.backend.release(key, tokens, age)
+        if not limited:
+            return False, remaining
+
+        # Lease a new block outside the local lock (the backend has its own)
+        granted, remaining = self.backend.acquire(api_key, self.lease_size)
+        with self.lock:
+            # The key may have been evicted meanwhile, and another thread may
+            # have leased a block for it too: keep every granted token
+            state = self._get_state(api_key, now)
+            state[2] = remaining
+            if granted:
+                state[0] += granted
+                state[1] = max(state[1], now + self.lease_ttl)
+            return self._check(state, now)
+
+    def _check(self, state, now):
+        # Local step only: spend a token of an unexpired lease. (True, 0)
+        # means the lease is used up and the backend has to be asked
+        if state[0] > 0 and now < state[1]:
+            state[0] -= 1
+            return False, state[0] + state[2]
+        return True, 0
+
+    def _give_back(self, key, state, now):
+        if state[0] > 0:
+            self.returns.append((key, state[0], now - (state[1] - self.lease_ttl)))
+            state[0] = 0
+
+    def _evicted(self, key, state, now):
+        self._give_back(key, state, now)
+
+    def _is_idle(self, state, now):
+        # An expired lease only holds tokens to give back
+        return now >= state[1]
+
+
+ALGORITHMS = {
+    "sliding_window": SlidingWindowCounterLimiter,
+    "token_bucket": TokenBucketLimiter,
+    "gcra": GCRALimiter,
+}
+
+BACKENDS = {
+    "shared": SharedTokenBuckets,
+    "redis": RedisFixedWindow,
+}
+
+
+def create_rate_limiter(requests_per_minute: int = 10,
+                        algorithm: str = RATE_LIMIT_ALGORITHM,
+                        backend: str = RATE_LIMIT_BACKEND) -> RateLimiter:
+    # NOTE: The shared backend always uses token buckets and the redis backend
+    # fixed windows; `algorithm` only applies to the local backend
+    if backend != "local":
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown rate limit backend '{backend}'. "
+                             f"Choose one of: local, {', '.join(BACKENDS)}")
+        return LeasingRateLimiter(BACKENDS[backend](requests_per_minute),
+                                  requests_per_minute=requests_per_minute)
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown rate limit algorithm '{algorithm}'. "
+                         f"Choose one of: {', '.join(ALGORITHMS)}")
+    return ALGORITHMS[algorithm](requests_per_minute=requests_per_minute)
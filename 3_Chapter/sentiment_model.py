@@ -1,5 +1,8 @@
 import asyncio
+import hashlib
+import string
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -8,8 +11,9 @@ from fastapi import Depends, HTTPException
 from fastapi.security import APIKeyHeader
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
+from rate_limiting import create_rate_limiter, RATE_LIMIT_ALGORITHM
+from compiled_model import compile_model
+from prefork import load_artifact
 
 load_dotenv()
 
@@ -17,6 +21,54 @@ load_dotenv()
 Path(__file__).parent.joinpath("models").mkdir(parents=True, exist_ok=True)
 PATH_TO_MODEL = Path(__file__).parent / "models" / "sentiment_model.joblib"
 
+POSITIVE_WORDS = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
+NEGATIVE_WORDS = ["hate", "terrible", "worst", "disappointed", "awful"]
+
+
+def load_lexicon(path):
+    """
+    Load a lexicon file with one term per line.
+    Blank lines and lines starting with '#' are ignored
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip().lower() for line in f
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+class SentimentFeaturizer:
+    """
+    Turns raw text into the [num_words, num_positive_words, num_complaints]
+    features used by the sentiment model.
+
+    The text is lowercased and tokenized once, and tokens are looked up in
+    hash sets, so the cost does not grow with the size of the lexicons and
+    words are only matched as whole tokens ("best" does not match "bestow")
+    """
+    def __init__(self, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS):
+        self.positive_words = frozenset(word.lower() for word in positive_words)
+        self.negative_words = frozenset(word.lower() for word in negative_words)
+
+    @classmethod
+    def from_files(cls, positive_path, negative_path):
+        return cls(load_lexicon(positive_path), load_lexicon(negative_path))
+
+    def featurize(self, text) -> list:
+        words = text.lower().split()
+        # Strip surrounding punctuation so "fantastic!" matches "fantastic"
+        tokens = {word.strip(string.punctuation) for word in words}
+        return [
+            len(words),
+            len(tokens & self.positive_words),
+            len(tokens & self.negative_words)
+        ]
+
+    def transform(self, texts) -> np.ndarray:
+        # Featurize a list of texts into a single (n_texts, 3) matrix
+        features = np.empty((len(texts), 3), dtype=np.float64)
+        for i, text in enumerate(texts):
+            features[i] = self.featurize(text)
+        return features
+
 # Model creation
 def train_and_save_model():
     data = {
@@ -37,12 +89,12 @@ def train_and_save_model():
 
     df = pd.DataFrame(data)
 
-    positive_words = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
-    negative_words = ["hate", "terrible", "worst", "disappointed", "awful"]
-
-    df["num_words"] = df["review"].apply(lambda x: len(x.split()))
-    df["num_positive_words"] = df["review"].apply(lambda x: sum(word in x.lower() for word in positive_words))
-    df["num_complaints"] = df["review"].apply(lambda x: sum(word in x.lower() for word in negative_words))
+    # Use the same featurizer as inference so training and serving stay in sync
+    featurizer = SentimentFeaturizer()
+    features = featurizer.transform(df["review"].tolist())
+    df["num_words"] = features[:, 0]
+    df["num_positive_words"] = features[:, 1]
+    df["num_complaints"] = features[:, 2]
 
     X = df[["num_words", "num_positive_words", "num_complaints"]]
     y = df["label"]
@@ -56,32 +108,91 @@ def train_and_save_model():
 
 # Define a callable class
 class SentimentAnalyzer:
-    def __init__(self, model_path=PATH_TO_MODEL):
+    def __init__(self, model_path=PATH_TO_MODEL, featurizer=None, cache=None):
         # If model file does not exist, train and save it
         if not Path(model_path).is_file():
             print("[INFO] Training and saving new model...")
             train_and_save_model()
-        self.model = joblib.load(model_path)
-        self.positive_words = ["love", "satisfied", "amazing", "fantastic", "wonderful", "pleased", "best"]
-        self.negative_words = ["hate", "terrible", "worst", "disappointed", "awful"]
+        # Memory-mapped when MODEL_MMAP=1, so forked workers share the arrays
+        self.model = load_artifact(model_path)
+        # Content hash of the artifact, used to tag cached predictions
+        self.model_version = hashlib.sha256(Path(model_path).read_bytes()).hexdigest()[:12]
+        # Optional PredictionCache in front of the model
+        self.cache = cache
+        # Fast NumPy inference engine (falls back to sklearn with INFERENCE_BACKEND=sklearn)
+        self.engine = compile_model(self.model)
+        # NOTE: Pass SentimentFeaturizer.from_files(...) to use larger lexicons
+        self.featurizer = featurizer or SentimentFeaturizer()
 
     # It allows the instance to be called like a function, like use the prediction method, but with data processing included
     def __call__(self, text):
-        num_words = len(text.split())
-        num_positive_words = sum(word in text.lower() for word in self.positive_words)
-        num_complaints = sum(word in text.lower() for word in self.negative_words)
-        features = [[num_words, num_positive_words, num_complaints]]
+        if self.cache is not None:
+            cached = self.cache.get(self.model_version, text)
+            if cached is not None:
+                return dict(cached)
+        result = self._predict(text)
+        if self.cache is not None:
+            self.cache.put(self.model_version, text, result)
+        return result
+
+    def _predict(self, text):
+        features = [self.featurizer.featurize(text)]
         
-        # Get prediction and confidence score
-        prediction = self.model.predict(features)
-        confidence_scores = self.model.predict_proba(features)
+        # Get prediction and confidence score in a single pass
+        prediction, confidence_scores = self.engine.predict_with_proba(features)
         
         # Return dictionary directly instead of JSON string
         result = {
             "label": "Positive" if prediction[0] == 1 else "Negative",
-            "confidence": float(confidence_scores[0][prediction[0]])
+            "confidence": float(confidence_scores[0].max()),
+            "model_version": self.model_version
         }
         return result
+
+    def heuristic(self, text):
+        # Keyword count only, no model call: the fallback when there is no
+        # time left for inference
+        _, positive, negative = self.featurizer.featurize(text)
+        matched = positive + negative
+        return {
+            "label": "Positive" if positive > negative else "Negative",
+            "confidence": 0.5 + 0.5 * abs(positive - negative) / matched if matched else 0.5,
+            "model_version": "heuristic"
+        }
+
+    def warmup(self):
+        # One prediction that bypasses the cache, run before serving a new model
+        self._predict("warm up")
+
+    def score_texts(self, texts):
+        # Featurize and score texts, bypassing the cache: (predictions, confidences)
+        features = self.featurizer.transform(texts)
+        predictions, confidence_scores = self.engine.predict_with_proba(features)
+        return predictions, confidence_scores.max(axis=1)
+
+    def predict_batch(self, texts, score_texts=None):
+        # Score many texts with a single predict_proba call (cached texts are skipped).
+        # score_texts can replace self.score_texts, e.g. to run it in another process
+        results = [None] * len(texts)
+        if self.cache is not None:
+            for i, text in enumerate(texts):
+                cached = self.cache.get(self.model_version, text)
+                if cached is not None:
+                    results[i] = dict(cached)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        predictions, confidences = (score_texts or self.score_texts)([texts[i] for i in missing])
+        for i, prediction, confidence in zip(missing, predictions.tolist(), confidences.tolist()):
+            results[i] = {
+                "label": "Positive" if prediction == 1 else "Negative",
+                "confidence": float(confidence),
+                "model_version": self.model_version
+            }
+            if self.cache is not None:
+                self.cache.put(self.model_version, texts[i], results[i])
+        return results
     
     async def async_call(self, text, sleep: int = 11):
         # Simulate a long-running operation
@@ -89,35 +200,6 @@ class SentimentAnalyzer:
         return self.__call__(text)
 
 
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 10):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)  # Store request timestamps per API key
-
-    def is_rate_limited(self, api_key: str) -> tuple[bool, int]:
-        """
-        Check if the request should be rate limited
-        Returns (is_limited, requests_remaining)
-        """
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
-        
-        # Remove requests older than 1 minute
-        self.requests[api_key] = [
-            req_time for req_time in self.requests[api_key]
-            if req_time > minute_ago
-        ]
-        
-        # Check if rate limit is exceeded
-        recent_requests = len(self.requests[api_key])
-        if recent_requests >= self.requests_per_minute:
-            return True, 0
-            
-        # Add new request timestamp
-        self.requests[api_key].append(now)
-        return False, self.requests_per_minute - recent_requests - 1
-
-
 api_key_header = APIKeyHeader(name="X-API-Key")
 API_KEY = os.getenv("API_KEY", "default_secret_key")
 
@@ -132,9 +214,9 @@ def verify_api_key(api_key: str = Depends(api_key_header)):
 
 rate_limiter = None
 
-def initialize_rate_limiter(requests_per_minute: int = 10):
+def initialize_rate_limiter(requests_per_minute: int = 10, algorithm: str = RATE_LIMIT_ALGORITHM):
     global rate_limiter
-    rate_limiter = RateLimiter(requests_per_minute=requests_per_minute)
+    rate_limiter = create_rate_limiter(requests_per_minute, algorithm)
 
 # Check api key and rate limit
 def test_api_key(api_key: str = Depends(api_key_header)):
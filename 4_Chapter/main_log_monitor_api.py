@@ -1,15 +1,65 @@
+import itertools
 import logging
+import os
 import time
-from fastapi import FastAPI, HTTPException, Depends, Request, status
+import numpy as np
+from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel, model_validator
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, PrivateAttr, model_validator
+from typing import Optional
 from contextlib import asynccontextmanager
-from penguin_model import PenguinClassifier, initialize_rate_limiter, test_api_key
+from penguin_model import PenguinClassifier, PATH_TO_MODEL, initialize_rate_limiter, test_api_key, verify_api_key
+from metrics import REGISTRY, CONTENT_TYPE_LATEST
+from request_logging import RequestLogger
+from prefork import preloaded
+from model_reload import ModelReloader
+from concurrency_limit import ConcurrencyLimits, ConcurrencyLimitMiddleware, CONCURRENCY_TARGET_MS
+from penguin_files import FEATURE_COLUMNS, file_format, map_columns, parse_row, parse_rows, read_chunks, score_file
+from fast_json import trusted_response
 
 
 # Set up logger
 logger = logging.getLogger('uvicorn.error')
+# Per-request access log, written as JSON lines by a background thread
+request_log = RequestLogger.from_env()
+
+# Request metrics, labelled by route template (not the raw URL) to keep cardinality bounded
+# NOTE: The histogram _count series doubles as the request counter by status code
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route, API version and status code",
+    ("method", "route", "version", "status")
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "Requests currently being processed", ("version",)
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter", ("route",)
+)
+VALIDATION_FAILURES = REGISTRY.counter(
+    "validation_failures_total", "Requests rejected by input validation", ("route",)
+)
+LOAD_SHED = REGISTRY.counter(
+    "load_shed_total", "Requests rejected with 503 by the concurrency limiter", ("route",)
+)
+
+# Adaptive in-flight limits for the inference routes; /health is never limited.
+# File scoring streams for much longer, so it has its own latency target
+concurrency = ConcurrencyLimits({
+    "/v1/penguin_classifier": CONCURRENCY_TARGET_MS,
+    "/v2/penguin_classifier": CONCURRENCY_TARGET_MS,
+    "/v1/penguin_classifier/file": float(os.getenv("CONCURRENCY_FILE_TARGET_MS", "30000")),
+})
+
+
+# Maximum number of rows in one v2 request
+V2_MAX_ROWS = int(os.getenv("V2_MAX_ROWS", "100000"))
+
+
+def api_version(path: str) -> str:
+    # "/v1/penguin_classifier" -> "v1"
+    prefix = path.split("/", 2)[1] if path.count("/") > 1 else ""
+    return prefix if prefix[:1] == "v" and prefix[1:].isdigit() else "none"
 
 
 class PenguinV1(BaseModel):
@@ -30,37 +80,53 @@ class PenguinV1(BaseModel):
         return self
 
 # Add v2 model
+# One penguin per line ("39.1 18.7 181 3750"), many lines per request
 class PenguinV2(BaseModel):
+    # Filled by parse_data below, so the string is only parsed once
+    _rows: tuple = PrivateAttr()
     data: str
 
     @model_validator(mode="after")
-    def check_non_empty(self):
+    def parse_data(self):
         if not self.data.strip():
             raise HTTPException(status_code=400, detail="Data must not be empty.")
-        return self
-    
-    @model_validator(mode="after")
-    def check_data_format(self):
-        if not len(self.data.split()) == 4:
-            raise HTTPException(status_code=400, detail="Data must contain exactly 4 space-separated values.")
-        return self
-    
-    @model_validator(mode="after")
-    def check_positive_values(self):
-        values = self.data.split()
-        for value in values:
-            if float(value) <= 0:
-                raise HTTPException(status_code=400, detail="All measurements must be positive values.")
+        lines = self.data.splitlines()
+        if len(lines) == 1:
+            # One penguin, the common case: plain floats, no arrays until scoring
+            row_values, error = parse_row(lines[0].split())
+            values, errors, line_numbers = [row_values], [error], [0]
+        else:
+            values, errors, line_numbers = parse_rows(self.data)
+        if len(errors) > V2_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"Data must not contain more than {V2_MAX_ROWS} rows.")
+        # A single row keeps failing the whole request; with many rows errors are per row
+        if len(errors) == 1 and errors[0]:
+            raise HTTPException(status_code=400, detail=errors[0])
+        # (values, errors, line numbers): lists for a single row, arrays from parse_rows
+        self._rows = (values, errors, line_numbers)
         return self
 
 class PredictionResponse(BaseModel):
     predicted_species: list[str]
     confidence: list[list[float]]
+    model_version: str
+
+class RowError(BaseModel):
+    row: int
+    detail: str
+
+# Rows that failed validation have null predictions and an entry in errors
+class MultiRowPredictionResponse(BaseModel):
+    predicted_species: list[Optional[str]]
+    confidence: list[Optional[list[float]]]
+    model_version: str
+    errors: list[RowError]
 
 
 def load_model():
     try:
-        classifier = PenguinClassifier()
+        # Under prefork.py the parent's already loaded instance is reused
+        classifier = preloaded("penguin_classifier", PenguinClassifier)
         return classifier
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
@@ -74,17 +140,30 @@ async def lifespan(app: FastAPI):
         raise RuntimeError("Failed to load the penguin classification model.")
     
     app.state.classifier = classifier
+    # Hot reload (POST /admin/reload_model or MODEL_WATCH_INTERVAL)
+    app.state.reloader = ModelReloader(
+        app.state, "classifier", PenguinClassifier, PATH_TO_MODEL,
+        warmup=lambda new_classifier: new_classifier.warmup(),
+    )
+    app.state.reloader.start()
     initialize_rate_limiter(requests_per_minute=10)
+    request_log.start()
     logger.info("[STARTUP] Penguin Classifier API is ready.")
     # This indicate to FastAPI that the startup tasks are done
     yield
     # The code after yield is executed during shutdown
     logger.info("[EXIT] Closing ML API...")
+    await app.state.reloader.stop()
+    request_log.stop()
+    logger.info(f"[EXIT] Request log stats: {request_log.stats()}")
     del app.state.classifier
 
 app = FastAPI(title="Penguin Classifier API",
               description="An API to classify penguin species with versioned endpoints.",
               lifespan=lifespan)
+# NOTE: Added before the metrics middleware below, so it runs inside it and
+# rejected requests are still counted and logged
+app.add_middleware(ConcurrencyLimitMiddleware, limits=concurrency)
 logger.info("FastAPI app created.")
 
 
@@ -94,13 +173,39 @@ async def validation_exception_handler(request, exc):
     # Return plain text response
     return PlainTextResponse(str(exc), status_code=400)
 
-# Middleware to log request processing time
+# Middleware to record the request metrics and log request processing time
 @app.middleware("http")
 async def log_process_time(request: Request, call_next):
+    version = api_version(request.url.path)
+    REQUESTS_IN_FLIGHT.inc((version,))
     start_time = time.perf_counter()
-    response = await call_next(request)
-    process_time = time.perf_counter() - start_time
-    logger.info(f"Request: {request.method} {request.url} completed in {process_time} seconds.")
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        process_time = time.perf_counter() - start_time
+        REQUESTS_IN_FLIGHT.dec((version,))
+        # The router stores the matched route in the scope; unmatched paths share one label
+        route = request.scope.get("route")
+        if route is not None:
+            route = route.path
+        elif concurrency.get(request.url.path) is not None:
+            # Shed by the concurrency limiter before reaching the router
+            route = request.url.path
+        else:
+            route = "unmatched"
+        REQUEST_LATENCY.observe(process_time, (request.method, route, version, str(status_code)))
+        if status_code == 503 and route in concurrency.limiters:
+            LOAD_SHED.inc((route,))
+        elif status_code == 429:
+            RATE_LIMIT_REJECTIONS.inc((route,))
+        elif status_code in (400, 422):
+            # RequestValidationError is turned into a 400 by the handler above
+            VALIDATION_FAILURES.inc((route,))
+        # Raw scope values only; formatting happens in the log writer thread
+        request_log.log(request.method, request.scope["path"], request.scope["query_string"],
+                        route, version, status_code, process_time)
     return response
 
 
@@ -114,8 +219,16 @@ def classify_penguin_v1(penguin: PenguinV1, api_key: str = Depends(test_api_key)
         )
     
     try:
-        result = app.state.classifier(features=penguin.model_dump())
-        return PredictionResponse(**result)
+        # Keep using the same instance for the whole request, even across a reload
+        with app.state.reloader.acquire() as classifier:
+            predictions, probabilities = classifier.predict_matrix(classifier.assembler.row(penguin))
+            model_version = classifier.model_version
+        # The arrays go straight to JSON, without building PredictionResponse
+        return trusted_response(PredictionResponse, {
+            "predicted_species": predictions,
+            "confidence": probabilities,
+            "model_version": model_version
+        })
     
     except Exception as e:
         raise HTTPException(
@@ -136,14 +249,34 @@ def classify_penguin_v2(penguin: PenguinV2, api_key: str = Depends(test_api_key)
         )
 
     try:
-        penguin_v1 = PenguinV1(
-            bill_length_mm=float(penguin.data.split()[0]),
-            bill_depth_mm=float(penguin.data.split()[1]),
-            flipper_length_mm=int(penguin.data.split()[2]),
-            body_mass_g=int(penguin.data.split()[3])
-        )
-        result = app.state.classifier(features=penguin_v1.model_dump())
-        return PredictionResponse(**result)
+        values, errors, line_numbers = penguin._rows
+        errors = np.asarray(errors, dtype=object)
+        valid = np.flatnonzero(errors == "")
+        with app.state.reloader.acquire() as classifier:
+            # Reorder the v2 columns to the model's features and score the block at once
+            order = [FEATURE_COLUMNS.index(name) for name in classifier.assembler.feature_names]
+            if valid.size:
+                predictions, probabilities = classifier.predict_matrix(np.asarray(values, dtype=np.float64)[valid][:, order])
+            model_version = classifier.model_version
+
+        if valid.size == len(errors):
+            # Every row is valid: the arrays go straight to JSON
+            species, confidence = predictions, probabilities
+        else:
+            # Rows that failed validation need a null, so build lists
+            species = [None] * len(errors)
+            confidence = [None] * len(errors)
+            if valid.size:
+                for i, label, proba in zip(valid.tolist(), predictions.tolist(), probabilities.tolist()):
+                    species[i] = label
+                    confidence[i] = proba
+        return trusted_response(MultiRowPredictionResponse, {
+            "predicted_species": species,
+            "confidence": confidence,
+            "model_version": model_version,
+            # Errors point at the line of the body, blank lines included
+            "errors": [{"row": int(line_numbers[i]), "detail": errors[i]} for i in np.flatnonzero(errors != "").tolist()]
+        })
     
     except Exception as e:
         raise HTTPException(
@@ -151,6 +284,70 @@ def classify_penguin_v2(penguin: PenguinV2, api_key: str = Depends(test_api_key)
             detail=f"Prediction error: {str(e)}"
         )
 
+# Score a CSV or Parquet file of penguins in chunks. The result CSV keeps every
+# input row and appends the species, the probabilities and an error column
+@app.post("/v1/penguin_classifier/file")
+def classify_penguin_file(file: UploadFile, api_key: str = Depends(test_api_key)):
+
+    if app.state.classifier is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+
+    # Read the first chunk up front so format and column errors are still a 400
+    try:
+        chunks = read_chunks(file.file, file_format(file.filename))
+        first = next(chunks, None)
+        if first is None:
+            raise ValueError("The file has no rows")
+        mapping = map_columns(first.columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid file: {str(e)}")
+
+    def results():
+        # One model instance for the whole file, even across a reload
+        with app.state.reloader.acquire() as classifier:
+            yield from score_file(itertools.chain([first], chunks), mapping, classifier)
+
+    name = (file.filename or "penguins").rsplit(".", 1)[0]
+    return StreamingResponse(
+        results(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{name}_predictions.csv"'}
+    )
+
+
+# Load, warm up and swap in the model artifact currently on disk
+@app.post("/admin/reload_model")
+async def reload_model(api_key: str = Depends(verify_api_key)):
+    try:
+        return await app.state.reloader.reload()
+    except Exception as e:
+        # The previous model keeps serving
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading model: {str(e)}"
+        )
+
+
+@app.get("/admin/model")
+async def model_status(api_key: str = Depends(verify_api_key)):
+    return app.state.reloader.stats()
+
+
+# Current limit, in-flight, queued and shed requests per limited route
+@app.get("/admin/concurrency")
+async def concurrency_status(api_key: str = Depends(verify_api_key)):
+    return concurrency.stats()
+
+
+# Expose the metrics in the Prometheus text format
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Create health check endpoint
 @app.get("/health", response_class=PlainTextResponse, status_code=status.HTTP_200_OK)
 async def get_health():
@@ -164,7 +361,8 @@ async def get_health():
     params = app.state.classifier.model.get_params()
     safe_params = {k: str(v) for k, v in params.items() if isinstance(v, (str, int, float, bool, list, dict, tuple))}
 
-    lines = [f"{k}: {v}" for k, v in safe_params.items()]
+    lines = [f"model_version: {app.state.classifier.model_version}"]
+    lines += [f"{k}: {v}" for k, v in safe_params.items()]
     return f"Health Check - Model Parameters:\n{'\n'.join(lines)}"
 
 
@@ -188,4 +386,18 @@ if __name__ == "__main__":
 #   -H "Content-Type: application/json" \
 #   -d '{"data": "39.1 18.7 181 3750"}'
 
-# curl -X GET "http://localhost:8080/health"
\ No newline at end of file
+# curl -X POST "http://localhost:8080/v2/penguin_classifier" \
+#   -H "X-API-Key: your_secret_key" \
+#   -H "Content-Type: application/json" \
+#   -d '{"data": "39.1 18.7 181 3750\n46.5 17.9 192 3500\n50.0 15.2 218 5700"}'
+
+# curl -X POST "http://localhost:8080/v1/penguin_classifier/file" \
+#   -H "X-API-Key: your_secret_key" \
+#   -F "file=@penguins.csv" -o penguins_predictions.csv
+
+# curl -X GET "http://localhost:8080/health"
+
+# curl -X GET "http://localhost:8080/metrics"
+
+# curl -X POST "http://localhost:8080/admin/reload_model" -H "X-API-Key: your_secret_key"
+# curl -X GET "http://localhost:8080/admin/concurrency" -H "X-API-Key: your_secret_key"
@@ -56,7 +56,7 @@ def classify_penguin_v1(penguin: PenguinV1, api_key: str = Depends(test_api_key)
         )
     
     try:
-        result = app.state.classifier(features=penguin.model_dump())
+        result = app.state.classifier(features=penguin)
         return PredictionResponse(**result)
     
     except Exception as e:
@@ -97,7 +97,7 @@ def classify_penguin_v2(penguin: PenguinV2, api_key: str = Depends(test_api_key)
             flipper_length_mm=int(penguin.data.split()[2]),
             body_mass_g=int(penguin.data.split()[3])
         )
-        result = app.state.classifier(features=penguin_v1.model_dump())
+        result = app.state.classifier(features=penguin_v1)
         return PredictionResponse(**result)
     
     except Exception as e:
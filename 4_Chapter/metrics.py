@@ -0,0 +1,173 @@
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds (Prometheus client defaults plus sub-millisecond ones)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base class for metrics aggregated in per-thread shards.
+
+    Each thread records into its own dict (label values -> cell), so the hot
+    path never takes a lock; shards are only merged when /metrics is scraped
+    """
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so owners can keep recording
+        return [shard.copy() for shard in shards]
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        shard = self._shard()
+        # Mutable one-item cells avoid re-hashing the labels to store the value
+        cell = shard.get(labels)
+        if cell is None:
+            cell = shard[labels] = [0]
+        cell[0] += amount
+
+    def collect(self) -> dict:
+        totals = {}
+        for shard in self._snapshots():
+            for labels, cell in shard.items():
+                totals[labels] = totals.get(labels, 0) + cell[0]
+        return totals
+
+    def render(self) -> list:
+        lines = super().render()
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    # Shards hold +/- deltas; their sum is the current value
+    type = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: tuple = ()):
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # One count per bucket, one for +Inf, then the sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        # Buckets are upper-inclusive (value <= le)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def collect(self) -> dict:
+        totals = {}
+        for shard in self._snapshots():
+            for labels, cell in shard.items():
+                cell = list(cell)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = cell
+                else:
+                    totals[labels] = [a + b for a, b in zip(total, cell)]
+        return totals
+
+    def render(self) -> list:
+        lines = super().render()
+        bounds = self.buckets + (float("inf"),)
+        for labels, cell in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cell):
+                cumulative += count
+                label_str = _format_labels(self.labelnames, labels, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the process metrics and renders them in the Prometheus text format
+    """
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Default registry shared by the modules of this chapter
+REGISTRY = MetricsRegistry()
+
+# Content type expected by Prometheus scrapers
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
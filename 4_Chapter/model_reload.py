@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+# Seconds between checks of the model artifact for changes (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+# Maximum seconds to wait for requests still using the previous model
+MODEL_DRAIN_TIMEOUT = float(os.getenv("MODEL_DRAIN_TIMEOUT", "30"))
+
+
+class ModelReloader:
+    """
+    Replaces the model stored in `state.<attr>` without downtime.
+
+    The new instance is loaded and warmed up in a background thread while the
+    current one keeps serving; once it is ready a single attribute assignment
+    swaps it in. Requests use the model through `acquire()`, so the previous
+    instance can be drained (waited on until no request holds it) before it
+    is released
+    """
+    def __init__(self, state, attr: str, loader: Callable[[], object], path,
+                 warmup: Callable[[object], None] = None,
+                 watch_interval: float = MODEL_WATCH_INTERVAL,
+                 drain_timeout: float = MODEL_DRAIN_TIMEOUT):
+        self.state = state
+        self.attr = attr
+        self.loader = loader
+        self.path = Path(path)
+        self.warmup = warmup
+        self.watch_interval = watch_interval
+        self.drain_timeout = drain_timeout
+        # Requests in progress per model instance (sync endpoints run in threads)
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._reload_lock = asyncio.Lock()
+        self._watch_task = None
+        self.reloads = 0
+        self.last_reload = None
+
+    @property
+    def model(self):
+        return getattr(self.state, self.attr)
+
+    @contextmanager
+    def acquire(self):
+        """
+        Use the current model for the duration of a request
+        """
+        model = self.model
+        key = id(model)
+        with self._in_flight_lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            yield model
+        finally:
+            with self._in_flight_lock:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+
+    def in_flight(self, model) -> int:
+        with self._in_flight_lock:
+            return self._in_flight.get(id(model), 0)
+
+    def _load_and_warm(self):
+        model = self.loader()
+        if self.warmup is not None:
+            # First predictions are slower (lazy imports, allocations), pay that here
+            self.warmup(model)
+        return model
+
+    async def _drain(self, model) -> bool:
+        deadline = time.monotonic() + self.drain_timeout
+        while self.in_flight(model):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def reload(self) -> dict:
+        async with self._reload_lock:
+            previous = self.model
+            start = time.perf_counter()
+            model = await asyncio.to_thread(self._load_and_warm)
+            if model.model_version == previous.model_version:
+                return {"status": "unchanged", "model_version": previous.model_version}
+
+            # Atomic swap: requests that start from here on get the new model
+            setattr(self.state, self.attr, model)
+            load_seconds = time.perf_counter() - start
+            drained = await self._drain(previous)
+            self.reloads += 1
+            self.last_reload = time.time()
+            print(f"[INFO] Model reloaded: {previous.model_version} -> {model.model_version} "
+                  f"in {load_seconds:.3f}s (drained: {drained})")
+            return {
+                "status": "reloaded",
+                "previous_version": previous.model_version,
+                "model_version": model.model_version,
+                "load_seconds": load_seconds,
+                "drained": drained,
+            }
+
+    def _artifact_signature(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _watch(self):
+        signature = self._artifact_signature()
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            current = self._artifact_signature()
+            # A missing file is usually a replacement in progress, wait for it
+            if current is None or current == signature:
+                continue
+            signature = current
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"[ERROR] Failed to reload model from {self.path}: {e}")
+
+    def start(self):
+        if self.watch_interval > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def stats(self) -> dict:
+        return {
+            "model_version": self.model.model_version,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+            "in_flight": self.in_flight(self.model),
+        }
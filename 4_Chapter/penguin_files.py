@@ -0,0 +1,193 @@
+import io
+import math
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet uploads are rejected without pyarrow
+    pq = None
+
+# Rows read, validated and scored at a time
+FILE_CHUNK_ROWS = int(os.getenv("FILE_CHUNK_ROWS", "50000"))
+
+# Same fields as PenguinV1; integer columns must not have a fractional part
+FEATURE_COLUMNS = ("bill_length_mm", "bill_depth_mm", "flipper_length_mm", "body_mass_g")
+INTEGER_COLUMNS = ("flipper_length_mm", "body_mass_g")
+INTEGER_INDEX = [FEATURE_COLUMNS.index(column) for column in INTEGER_COLUMNS]
+# v2 bodies with up to this many rows are parsed with plain floats: for a
+# handful of rows the NumPy setup costs more than the parsing itself
+SCALAR_PARSE_MAX_ROWS = int(os.getenv("SCALAR_PARSE_MAX_ROWS", "8"))
+
+
+def normalize_column(name) -> str:
+    # "Bill Length (mm)" / "bill-length-mm" -> "bill_length_mm"
+    name = str(name).strip().lower().replace("(", "").replace(")", "")
+    return "_".join(name.replace("-", " ").split())
+
+
+def file_format(filename: str) -> str:
+    suffix = os.path.splitext(filename or "")[1].lower()
+    return "parquet" if suffix in (".parquet", ".pq") else "csv"
+
+
+def read_chunks(file, fmt: str, chunk_rows: int = FILE_CHUNK_ROWS):
+    """
+    Yield the uploaded file as DataFrames of at most `chunk_rows` rows
+    """
+    if fmt == "parquet":
+        if pq is None:
+            raise ValueError("Parquet support requires pyarrow, upload a CSV file instead")
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Read everything as text so bad values are reported per row, not per file
+        yield from pd.read_csv(io.TextIOWrapper(file, encoding="utf-8", newline=""),
+                               chunksize=chunk_rows, dtype=str, keep_default_na=False)
+
+
+def map_columns(columns) -> dict:
+    """
+    Map the file's column names to the PenguinV1 fields, or raise
+    ValueError listing the fields that are missing
+    """
+    mapping = {}
+    for column in columns:
+        normalized = normalize_column(column)
+        if normalized in FEATURE_COLUMNS and normalized not in mapping.values():
+            mapping[column] = normalized
+    missing = [field for field in FEATURE_COLUMNS if field not in mapping.values()]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    return mapping
+
+
+def validate_chunk(df: pd.DataFrame, mapping: dict, feature_names):
+    """
+    Vectorized PenguinV1 checks. Returns the feature matrix (in the model's
+    column order) and one error message per row ("" for valid rows)
+    """
+    by_field = {field: column for column, field in mapping.items()}
+    X = np.empty((len(df), len(feature_names)), dtype=np.float64)
+    errors = np.full(len(df), "", dtype=object)
+    for j, field in enumerate(feature_names):
+        values = pd.to_numeric(df[by_field[field]], errors="coerce").to_numpy(dtype=np.float64)
+        X[:, j] = values
+        missing = np.isnan(values)
+        errors[missing] += f"{field} must be a number; "
+        with np.errstate(invalid="ignore"):
+            errors[~missing & (values <= 0)] += f"{field} must be positive; "
+            if field in INTEGER_COLUMNS:
+                errors[~missing & (values % 1 != 0)] += f"{field} must be an integer; "
+    errors = np.array([error.rstrip("; ") for error in errors], dtype=object)
+    return X, errors
+
+
+def score_chunk(df: pd.DataFrame, mapping: dict, classifier) -> pd.DataFrame:
+    """
+    Append predicted_species, one probability column per species and an
+    error column to a chunk; invalid rows are kept with empty predictions
+    """
+    X, errors = validate_chunk(df, mapping, classifier.assembler.feature_names)
+    valid = errors == ""
+    classes = list(classifier.engine.classes_)
+    species = np.full(len(df), "", dtype=object)
+    proba = np.full((len(df), len(classes)), np.nan)
+    if valid.any():
+        species[valid], proba[valid] = classifier.predict_matrix(X[valid])
+
+    result = df.copy()
+    result["predicted_species"] = species
+    for k, name in enumerate(classes):
+        result[f"probability_{name}"] = proba[:, k]
+    result["error"] = errors
+    return result
+
+
+def score_file(chunks, mapping: dict, classifier):
+    """
+    Score DataFrame chunks and yield the result file as CSV text, one piece
+    per chunk (the header only goes with the first one)
+    """
+    header = True
+    for df in chunks:
+        yield score_chunk(df, mapping, classifier).to_csv(index=False, header=header)
+        header = False
+
+
+NOT_NUMBERS = "All measurements must be numbers."
+NOT_POSITIVE = "All measurements must be positive values."
+NOT_INTEGERS = f"{' and '.join(INTEGER_COLUMNS)} must be integers."
+
+
+def parse_row(tokens: list, n_columns: int = len(FEATURE_COLUMNS)):
+    """
+    One already split v2 row with plain float(): (values, error message),
+    with the same checks and messages as parse_rows
+    """
+    if len(tokens) != n_columns:
+        return [math.nan] * n_columns, f"Data must contain exactly {n_columns} space-separated values."
+    try:
+        values = list(map(float, tokens))
+    except ValueError:
+        return [math.nan] * n_columns, NOT_NUMBERS
+    for value in values:
+        if not 0 < value < math.inf:
+            # NaN or infinite anywhere in the row wins over a non-positive value
+            return values, NOT_POSITIVE if all(map(math.isfinite, values)) else NOT_NUMBERS
+    for i in INTEGER_INDEX:
+        if values[i] % 1:
+            return values, NOT_INTEGERS
+    return values, ""
+
+
+def parse_rows(data: str, n_columns: int = len(FEATURE_COLUMNS)):
+    """
+    Parse the compact v2 format (one row per line, whitespace-separated
+    values in FEATURE_COLUMNS order) with a single conversion to float64.
+
+    Returns the (n_rows, n_columns) values, one error message per row
+    ("" for valid rows) and the index of each row's line in `data`. Blank
+    lines are skipped. Bodies of up to SCALAR_PARSE_MAX_ROWS rows are parsed
+    row by row with parse_row
+    """
+    lines, rows = [], []
+    for i, line in enumerate(data.splitlines()):
+        row = line.split()
+        if row:
+            lines.append(i)
+            rows.append(row)
+    lines = np.array(lines, dtype=np.intp)
+    if len(rows) <= SCALAR_PARSE_MAX_ROWS:
+        parsed = [parse_row(row, n_columns) for row in rows]
+        values = np.array([row_values for row_values, _ in parsed], dtype=np.float64)
+        errors = np.array([error for _, error in parsed], dtype=object)
+        return values.reshape(len(rows), n_columns), errors, lines
+
+    counts = np.fromiter(map(len, rows), dtype=np.intp, count=len(rows))
+    well_formed = counts == n_columns
+    values = np.full((len(rows), n_columns), np.nan)
+    try:
+        values[well_formed] = np.array(
+            [token for row, ok in zip(rows, well_formed) if ok for token in row], dtype=np.float64
+        ).reshape(-1, n_columns)
+    except ValueError:
+        # Some token is not a number: convert row by row to find out which
+        for i in np.flatnonzero(well_formed):
+            try:
+                values[i] = np.array(rows[i], dtype=np.float64)
+            except ValueError:
+                pass
+
+    with np.errstate(invalid="ignore"):
+        numeric = well_formed & np.isfinite(values).all(axis=1)
+        positive = numeric & (values > 0).all(axis=1)
+        integer = positive & (values[:, INTEGER_INDEX] % 1 == 0).all(axis=1)
+    errors = np.select(
+        [~well_formed, ~numeric, ~positive, ~integer],
+        [f"Data must contain exactly {n_columns} space-separated values.",
+         NOT_NUMBERS, NOT_POSITIVE, NOT_INTEGERS],
+        default=""
+    ).astype(object)
+    return values, errors, lines
@@ -1,13 +1,18 @@
 import asyncio
-import joblib
+import hashlib
+import threading
+import time
+import numpy as np
+from operator import attrgetter, itemgetter
 from pathlib import Path
 from fastapi import Depends, HTTPException
 from fastapi.security import APIKeyHeader
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
-import pandas as pd
+from rate_limiting import create_rate_limiter, RATE_LIMIT_ALGORITHM
+from pipeline_compiler import compile_pipeline
+from metrics import REGISTRY
+from prefork import load_artifact
 
 load_dotenv()
 
@@ -15,56 +20,95 @@ load_dotenv()
 Path(__file__).parent.joinpath("models").mkdir(parents=True, exist_ok=True)
 PATH_TO_MODEL = Path(__file__).parent / "models" / "penguin_classifier.pkl"
 
+# Model time only (feature assembly + prediction), without the framework overhead
+INFERENCE_LATENCY = REGISTRY.histogram(
+    "penguin_inference_seconds", "Time spent inside PenguinClassifier predictions"
+)
+INFERENCE_IN_FLIGHT = REGISTRY.gauge(
+    "penguin_inference_in_flight", "Predictions currently running"
+)
+
+class FeatureAssembler:
+    """
+    Builds model input arrays straight from validated request fields.
+
+    The column order is fixed once from the model's feature_names_in_, and
+    records (Pydantic models or dicts) are written into float64 arrays
+    without going through pandas
+    """
+    def __init__(self, feature_names):
+        self.feature_names = tuple(feature_names)
+        self._get_attrs = attrgetter(*self.feature_names)
+        self._get_items = itemgetter(*self.feature_names)
+        # One reusable single-row buffer per thread (sync endpoints run in a threadpool)
+        self._local = threading.local()
+
+    def _values(self, record):
+        if isinstance(record, dict):
+            return self._get_items(record)
+        return self._get_attrs(record)
+
+    def row(self, record) -> np.ndarray:
+        # NOTE: The returned (1, n_features) buffer is reused by the next call
+        # in the same thread, so it must be consumed before then
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        buffer[0] = self._values(record)
+        return buffer
+
+    def batch(self, records) -> np.ndarray:
+        X = np.empty((len(records), len(self.feature_names)), dtype=np.float64)
+        for i, record in enumerate(records):
+            X[i] = self._values(record)
+        return X
+
+
 # Define a callable class
 class PenguinClassifier:
     def __init__(self, model_path=PATH_TO_MODEL):
-        self.model = joblib.load(model_path)
+        # Memory-mapped when MODEL_MMAP=1, so forked workers share the arrays
+        self.model = load_artifact(model_path)
+        # Content hash of the artifact, returned with every prediction
+        self.model_version = hashlib.sha256(Path(model_path).read_bytes()).hexdigest()[:12]
+        # Array-backed copy of the pipeline (falls back to sklearn with INFERENCE_BACKEND=sklearn)
+        self.engine = compile_pipeline(self.model)
+        self.assembler = FeatureAssembler(self.engine.feature_names_in_)
 
     # It allows the instance to be called like a function, like use the prediction method, but with data processing included
     def __call__(self, features):
-
-        df = pd.DataFrame([features])
-
-        # Get prediction and confidence score
-        predictions = self.model.predict(df)
-        confidence = self.model.predict_proba(df)
+        # features can be a validated Pydantic model or a dict with the feature names
+        return self.predict_array(self.assembler.row(features))
+
+    def predict_batch(self, records):
+        return self.predict_array(self.assembler.batch(records))
+
+    def predict_matrix(self, X):
+        # Species and class probabilities as arrays, for a (n_rows, n_features) matrix
+        INFERENCE_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            return self.engine.predict_with_proba(X)
+        finally:
+            INFERENCE_LATENCY.observe(time.perf_counter() - start)
+            INFERENCE_IN_FLIGHT.dec()
+
+    def predict_array(self, X):
+        # Get prediction and confidence score in a single pass
+        predictions, confidence = self.predict_matrix(X)
         
         # Return dictionary directly instead of JSON string
         result = {
             "predicted_species": predictions.tolist(),
-            "confidence": confidence.tolist()
+            "confidence": confidence.tolist(),
+            "model_version": self.model_version
         }
         return result
-    
 
-
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 10):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)  # Store request timestamps per API key
-
-    def is_rate_limited(self, api_key: str) -> tuple[bool, int]:
-        """
-        Check if the request should be rate limited
-        Returns (is_limited, requests_remaining)
-        """
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
-        
-        # Remove requests older than 1 minute
-        self.requests[api_key] = [
-            req_time for req_time in self.requests[api_key]
-            if req_time > minute_ago
-        ]
-        
-        # Check if rate limit is exceeded
-        recent_requests = len(self.requests[api_key])
-        if recent_requests >= self.requests_per_minute:
-            return True, 0
-            
-        # Add new request timestamp
-        self.requests[api_key].append(now)
-        return False, self.requests_per_minute - recent_requests - 1
+    def warmup(self):
+        # One prediction outside the metrics, run before serving a new model
+        self.engine.predict_with_proba(np.zeros((1, len(self.assembler.feature_names))))
+    
 
 
 api_key_header = APIKeyHeader(name="X-API-Key")
@@ -81,9 +125,9 @@ def verify_api_key(api_key: str = Depends(api_key_header)):
 
 rate_limiter = None
 
-def initialize_rate_limiter(requests_per_minute: int = 10):
+def initialize_rate_limiter(requests_per_minute: int = 10, algorithm: str = RATE_LIMIT_ALGORITHM):
     global rate_limiter
-    rate_limiter = RateLimiter(requests_per_minute=requests_per_minute)
+    rate_limiter = create_rate_limiter(requests_per_minute, algorithm)
 
 # Check api key and rate limit
 def test_api_key(api_key: str = Depends(api_key_header)):
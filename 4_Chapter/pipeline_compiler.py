@@ -0,0 +1,182 @@
+import os
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 (required to import IterativeImputer)
+from sklearn.impute import IterativeImputer
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+
+# Set INFERENCE_BACKEND=sklearn to skip the compiled fast path and use the
+# fitted scikit-learn pipeline directly
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "compiled")
+
+
+class CompiledImputer:
+    """
+    Array-backed version of a fitted IterativeImputer whose estimators are
+    linear (BayesianRidge by default). Rows without missing values are
+    returned untouched, without running any imputation round
+    """
+    def __init__(self, imputer: IterativeImputer):
+        if imputer.add_indicator or imputer.sample_posterior:
+            raise TypeError("IterativeImputer with add_indicator/sample_posterior is not supported")
+        statistics = imputer.initial_imputer_.statistics_
+        if np.isnan(statistics).any():
+            raise TypeError("IterativeImputer with empty features is not supported")
+
+        self.statistics = np.asarray(statistics, dtype=np.float64)
+        self.min_value = np.asarray(imputer._min_value, dtype=np.float64)
+        self.max_value = np.asarray(imputer._max_value, dtype=np.float64)
+        self.n_iter = imputer.n_iter_
+        # One (feature, neighbor features, coefficients, intercept) entry per imputation step
+        self.steps = []
+        for triplet in imputer.imputation_sequence_:
+            estimator = triplet.estimator
+            if not hasattr(estimator, "coef_"):
+                raise TypeError(f"{type(estimator).__name__} is not a linear imputation estimator")
+            self.steps.append((
+                triplet.feat_idx,
+                np.asarray(triplet.neighbor_feat_idx, dtype=np.intp),
+                np.ascontiguousarray(estimator.coef_, dtype=np.float64),
+                float(estimator.intercept_),
+            ))
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        missing = np.isnan(X)
+        if not missing.any():
+            return X
+
+        # Only rows with missing values go through the imputation rounds
+        rows = missing.any(axis=1)
+        X_missing = X[rows]
+        mask = missing[rows]
+        X_filled = np.where(mask, self.statistics, X_missing)
+        # Same shortcut as IterativeImputer.transform: when nothing was fitted
+        # or every value is missing, only the initial imputation is applied
+        steps = self.steps if self.n_iter and not missing.all() else []
+
+        for feat_idx, neighbor_idx, coef, intercept in steps:
+            missing_rows = mask[:, feat_idx]
+            if not missing_rows.any():
+                continue
+            imputed = X_filled[np.ix_(missing_rows, neighbor_idx)] @ coef + intercept
+            X_filled[missing_rows, feat_idx] = np.clip(
+                imputed, self.min_value[feat_idx], self.max_value[feat_idx]
+            )
+
+        result = X.copy()
+        result[rows] = X_filled
+        return result
+
+
+class CompiledTree:
+    """
+    Flat node arrays (feature, threshold, left, right, value) of a fitted
+    DecisionTreeClassifier, traversed for all rows of a batch at once
+    """
+    def __init__(self, tree: DecisionTreeClassifier):
+        if tree.n_outputs_ != 1:
+            raise TypeError("Multi-output trees are not supported")
+        nodes = tree.tree_
+        self.feature = nodes.feature.astype(np.intp)
+        self.threshold = nodes.threshold.astype(np.float64)
+        self.left = nodes.children_left.astype(np.intp)
+        self.right = nodes.children_right.astype(np.intp)
+        # Normalize leaf values into class probabilities once
+        value = nodes.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1.0
+        self.value = value / normalizer
+        self.classes_ = tree.classes_
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        # sklearn compares float32 inputs against float64 thresholds
+        X = X.astype(np.float32)
+        node = np.zeros(X.shape[0], dtype=np.intp)
+        active = np.arange(X.shape[0]) if self.left[0] != -1 else np.empty(0, dtype=np.intp)
+        # One vectorized step per tree level until every row reaches a leaf
+        while active.size:
+            current = node[active]
+            go_left = X[active, self.feature[current]] <= self.threshold[current]
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[node[active]] != -1]
+        return node
+
+    def predict_with_proba(self, X: np.ndarray):
+        proba = self.value[self.apply(X)]
+        return self.classes_[proba.argmax(axis=1)], proba
+
+
+class CompiledPipeline:
+    """
+    IterativeImputer + DecisionTreeClassifier pipeline compiled to NumPy arrays
+    """
+    backend = "compiled"
+
+    def __init__(self, pipeline: Pipeline):
+        if len(pipeline.steps) != 2:
+            raise TypeError("Only imputer + decision tree pipelines are supported")
+        (_, imputer), (_, tree) = pipeline.steps
+        if not isinstance(imputer, IterativeImputer) or not isinstance(tree, DecisionTreeClassifier):
+            raise TypeError("Only IterativeImputer + DecisionTreeClassifier pipelines are supported")
+        self.imputer = CompiledImputer(imputer)
+        self.tree = CompiledTree(tree)
+        self.classes_ = self.tree.classes_
+        self.feature_names_in_ = list(pipeline.feature_names_in_)
+
+    def predict_with_proba(self, X: np.ndarray):
+        X = np.asarray(X, dtype=np.float64)
+        return self.tree.predict_with_proba(self.imputer.transform(X))
+
+
+class SklearnPipeline:
+    """
+    Fallback with the same interface as CompiledPipeline
+    """
+    backend = "sklearn"
+
+    def __init__(self, pipeline: Pipeline):
+        self.pipeline = pipeline
+        self.classes_ = pipeline.classes_
+        self.feature_names_in_ = list(pipeline.feature_names_in_)
+
+    def predict_with_proba(self, X: np.ndarray):
+        # The pipeline was fitted on a DataFrame, so keep the feature names
+        df = pd.DataFrame(X, columns=self.feature_names_in_)
+        proba = self.pipeline.predict_proba(df)
+        return self.classes_[proba.argmax(axis=1)], proba
+
+
+def verify_equivalence(compiled, pipeline, n_samples=2000, seed=0) -> bool:
+    """
+    Compare the compiled pipeline with sklearn on random rows, some of them
+    with missing values
+    """
+    rng = np.random.default_rng(seed)
+    statistics = compiled.imputer.statistics
+    X = rng.normal(loc=statistics, scale=np.abs(statistics) * 0.25,
+                   size=(n_samples, len(statistics)))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    df = pd.DataFrame(X, columns=compiled.feature_names_in_)
+
+    labels, proba = compiled.predict_with_proba(X)
+    return (np.array_equal(labels, pipeline.predict(df))
+            and np.array_equal(proba, pipeline.predict_proba(df)))
+
+
+def compile_pipeline(pipeline: Pipeline, backend=INFERENCE_BACKEND):
+    """
+    Return a CompiledPipeline, or fall back to sklearn if the backend is
+    disabled, the pipeline is not supported or the outputs do not match
+    """
+    if backend != "compiled":
+        return SklearnPipeline(pipeline)
+    try:
+        compiled = CompiledPipeline(pipeline)
+    except TypeError as e:
+        print(f"[INFO] Using sklearn inference: {e}")
+        return SklearnPipeline(pipeline)
+    if not verify_equivalence(compiled, pipeline):
+        print("[WARNING] Compiled pipeline does not match sklearn outputs, using sklearn inference")
+        return SklearnPipeline(pipeline)
+    return compiled
@@ -0,0 +1,113 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+
+class RequestLogger:
+    """
+    Sampled, non-blocking request logger.
+
+    The request path only appends a raw tuple to a bounded buffer; a
+    background thread formats the records as JSON lines and writes them.
+    Fast successful requests are sampled at `sample_rate`, slow (>= slow_ms)
+    and failed (status >= 400) requests are always kept. When the buffer is
+    full the record is dropped and counted instead of blocking the caller
+    """
+    def __init__(self, stream=None, sample_rate: float = 0.01, slow_ms: float = 500.0,
+                 max_buffer: int = 10_000, flush_interval: float = 0.1):
+        self.stream = stream or sys.stderr
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        # deque.append/popleft are thread-safe, so producers never take a lock
+        self.buffer = deque()
+        self.dropped = 0
+        self.sampled_out = 0
+        self.written = 0
+        self._reported_dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("REQUEST_LOG_PATH")
+        return cls(
+            stream=open(path, "a", encoding="utf-8", buffering=1 << 16) if path else None,
+            sample_rate=float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01")),
+            slow_ms=float(os.getenv("REQUEST_LOG_SLOW_MS", "500")),
+            max_buffer=int(os.getenv("REQUEST_LOG_BUFFER", "10000")),
+        )
+
+    def log(self, method: str, path: str, query: bytes, route: str, version: str,
+            status: int, duration: float):
+        # Sampling first, so dropped-by-sampling requests cost almost nothing
+        if status < 400 and duration < self.slow_seconds and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.buffer.append((time.time(), method, path, query, route, version, status, duration))
+
+    @staticmethod
+    def _format(record) -> str:
+        timestamp, method, path, query, route, version, status, duration = record
+        if query:
+            path = f"{path}?{query.decode('latin-1')}"
+        return json.dumps({
+            "ts": round(timestamp, 6),
+            "event": "request",
+            "method": method,
+            "path": path,
+            "route": route,
+            "version": version,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+        })
+
+    def flush(self):
+        lines = []
+        while self.buffer:
+            lines.append(self._format(self.buffer.popleft()))
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            lines.append(json.dumps({"ts": round(time.time(), 6), "event": "dropped",
+                                     "count": dropped - self._reported_dropped}))
+            self._reported_dropped = dropped
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.written += len(lines)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] Request log writer failed: {e}", file=sys.stderr)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-logger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Write whatever is left before shutting down
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+        }
@@ -0,0 +1,86 @@
+"""
+Benchmark for CommentScorer in 2_Chapter/main_scorer_api.py
+
+Compares scoring comments one row at a time (the /predict_trust path) with
+the vectorized predict_batch at several batch sizes, and checks that both
+give exactly the same scores as the original scalar implementation.
+
+Usage:
+    python benchmarks/comment_scorer_bench.py --rows 1 1000 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "2_Chapter"))
+from main_scorer_api import CommentScorer  # noqa: E402
+
+
+def legacy_predict(features: np.ndarray) -> float:
+    # Scalar implementation used before predict_batch (baseline)
+    length, reputation, reports = features[0]
+    score = (0.3 * (length/500) +
+             0.5 * (reputation/100) +
+             -0.2 * reports)
+    return float(max(min(score * 100, 100), 0))
+
+
+def random_features(n_rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 5000, n_rows),   # length
+        rng.integers(0, 1000, n_rows),   # user_reputation
+        rng.integers(0, 10, n_rows),     # report_count
+    ]).astype(np.int64)
+
+
+def bench(scorer, n_rows: int, max_loop_rows: int) -> dict:
+    X = random_features(n_rows)
+
+    # Row by row, as /predict_trust does (capped, reported per row)
+    loop_rows = min(n_rows, max_loop_rows)
+    rows = [X[i:i + 1] for i in range(loop_rows)]
+    start = time.perf_counter()
+    legacy = [legacy_predict(row) for row in rows]
+    loop = (time.perf_counter() - start) / loop_rows
+
+    start = time.perf_counter()
+    single = [scorer.predict(row) for row in rows]
+    single_time = (time.perf_counter() - start) / loop_rows
+
+    # Best of a few runs for the vectorized call
+    batch_time = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        scores = scorer.predict_batch(X)
+        batch_time = min(batch_time, time.perf_counter() - start)
+
+    return {
+        "rows": n_rows,
+        "legacy_ns_per_row": loop * 1e9,
+        "predict_ns_per_row": single_time * 1e9,
+        "batch_ns_per_row": batch_time / n_rows * 1e9,
+        "exact": legacy == single == scores[:loop_rows].tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1_000, 1_000_000])
+    parser.add_argument("--max-loop-rows", type=int, default=100_000,
+                        help="Rows scored one at a time (the row-by-row paths are slow)")
+    args = parser.parse_args()
+
+    scorer = CommentScorer()
+    print(f"{'rows':>10}{'legacy ns/row':>16}{'predict ns/row':>16}{'batch ns/row':>14}{'exact':>7}")
+    for n_rows in args.rows:
+        r = bench(scorer, n_rows, args.max_loop_rows)
+        print(f"{r['rows']:>10}{r['legacy_ns_per_row']:>16.0f}{r['predict_ns_per_row']:>16.0f}"
+              f"{r['batch_ns_per_row']:>14.1f}{str(r['exact']):>7}")
+
+
+if __name__ == "__main__":
+    main()
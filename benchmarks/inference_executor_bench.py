@@ -0,0 +1,74 @@
+"""
+Benchmark for InferenceExecutor in 3_Chapter/inference_executor.py
+
+Scores the same texts with several concurrent callers (like the micro-batcher
+and the job workers do) in thread mode and in process mode, reports the
+throughput of each and checks that both give the same results.
+
+Usage:
+    python benchmarks/inference_executor_bench.py --processes 1 2 4 --batch-size 64 512
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "3_Chapter"))
+from sentiment_model import SentimentAnalyzer  # noqa: E402
+from inference_executor import InferenceExecutor  # noqa: E402
+
+WORDS = ["love", "hate", "product", "terrible", "amazing", "the", "was", "quality",
+         "worst", "fantastic", "delivery", "not", "good", "really", "pleased"]
+
+
+def random_texts(n_texts: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(5, 60))) for _ in range(n_texts)]
+
+
+def run(executor, model, batches, callers: int) -> tuple:
+    # Every caller thread submits whole batches, as asyncio.to_thread would
+    start = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        results = list(pool.map(lambda batch: executor.predict_batch(model, batch), batches))
+    return time.perf_counter() - start, [result for batch in results for result in batch]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--texts", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[64, 512])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--callers", type=int, default=8, help="Concurrent threads submitting batches")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    # No prediction cache, every text goes through the model
+    model = SentimentAnalyzer()
+    texts = random_texts(args.texts)
+
+    print(f"{'batch':>7}{'mode':>14}{'texts/s':>12}{'same':>6}")
+    for batch_size in args.batch_size:
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        executor = InferenceExecutor("thread")
+        elapsed, expected = run(executor, model, batches, args.callers)
+        print(f"{batch_size:>7}{'thread':>14}{len(texts) / elapsed:>12.0f}{'':>6}")
+
+        for processes in args.processes:
+            executor = InferenceExecutor("process", processes=processes)
+            executor.start()
+            try:
+                run(executor, model, batches[:processes * 2], args.callers)  # warm up
+                elapsed, results = run(executor, model, batches, args.callers)
+            finally:
+                executor.stop()
+            mode = f"process x{processes}"
+            print(f"{batch_size:>7}{mode:>14}{len(texts) / elapsed:>12.0f}{str(results == expected):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark for KeywordEngine in 2_Chapter/keyword_engine.py
+
+Compares the original analyze_comment loop (one substring check per term)
+with the Aho-Corasick automaton as the lexicon grows, and checks that both
+find the same issues.
+
+Usage:
+    python benchmarks/keyword_engine_bench.py --terms 4 1000 50000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "2_Chapter"))
+from keyword_engine import KeywordEngine  # noqa: E402
+
+BASE_TERMS = ["spam", "hate", "offensive", "abuse"]
+
+
+def naive_issues(text: str, terms) -> list:
+    # Original analyze_comment implementation (baseline)
+    text_lower = text.lower()
+    return [keyword for keyword in terms if keyword in text_lower]
+
+
+def random_lexicon(n_terms: int, rng: random.Random) -> list:
+    terms = list(BASE_TERMS[:n_terms])
+    seen = set(terms)
+    while len(terms) < n_terms:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+                 for _ in range(rng.randint(1, 3))]
+        term = " ".join(words)
+        if term not in seen:
+            seen.add(term)
+            terms.append(term)
+    return terms
+
+
+def random_texts(n_texts: int, text_words: int, terms, rng: random.Random) -> list:
+    texts = []
+    for _ in range(n_texts):
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8)))
+                 for _ in range(text_words)]
+        # Plant a couple of lexicon terms in every text
+        for term in rng.sample(terms, min(2, len(terms))):
+            words.insert(rng.randrange(len(words) + 1), term.upper())
+        texts.append(" ".join(words))
+    return texts
+
+
+def per_text_us(fn, texts) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        fn(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def bench(n_terms: int, n_texts: int, text_words: int) -> dict:
+    rng = random.Random(n_terms)
+    terms = random_lexicon(n_terms, rng)
+    texts = random_texts(n_texts, text_words, terms, rng)
+
+    start = time.perf_counter()
+    engine = KeywordEngine(terms)
+    build = time.perf_counter() - start
+
+    naive = per_text_us(lambda text: naive_issues(text, terms), texts)
+    automaton = per_text_us(lambda text: engine.issues(engine.find(text)), texts)
+    same = all(naive_issues(text, terms) == engine.issues(engine.find(text)) for text in texts)
+    return {"terms": n_terms, "build_s": build, "naive_us": naive,
+            "automaton_us": automaton, "same": same}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--terms", type=int, nargs="+", default=[4, 1_000, 50_000])
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--text-words", type=int, default=60,
+                        help="Random words per text (plus two planted terms)")
+    args = parser.parse_args()
+
+    print(f"{'terms':>8}{'build s':>10}{'naive us/text':>16}{'automaton us/text':>20}{'same':>6}")
+    for n_terms in args.terms:
+        r = bench(n_terms, args.texts, args.text_words)
+        print(f"{r['terms']:>8}{r['build_s']:>10.2f}{r['naive_us']:>16.1f}"
+              f"{r['automaton_us']:>20.1f}{str(r['same']):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+"""
+Load test for the chapter apps
+
+Drives each app with a fixed number of concurrent clients for a fixed time
+and reports requests per second, latency percentiles and CPU time per
+request. Apps run in-process behind an ASGI transport (--mode asgi, the
+CPU figure then includes the in-process client) or as real uvicorn worker
+processes sharing one socket (--mode uvicorn, server CPU only).
+
+Every app runs in its own subprocess, from its chapter directory, with the
+per-key rate limits opened up so the limiter does not cap the test.
+
+Usage:
+    python benchmarks/load_test.py --list
+    python benchmarks/load_test.py --apps penguin_api main_log_monitor_api --concurrency 1 16 64
+    python benchmarks/load_test.py --mode uvicorn --workers 2 --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json --threshold 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "LOADTEST "
+
+PENGUIN = {"bill_length_mm": 39.1, "bill_depth_mm": 18.7, "flipper_length_mm": 181, "body_mass_g": 3750}
+PENGUIN_ROWS = ["39.1 18.7 181 3750", "46.5 17.9 192 3500", "50.0 15.2 218 5700"]
+WORDS = ["love", "hate", "product", "terrible", "amazing", "the", "was", "quality",
+         "worst", "fantastic", "delivery", "not", "good", "really", "pleased", "spam"]
+
+
+def sentence(rng: random.Random, n_words: int = 12) -> str:
+    return " ".join(rng.choices(WORDS, k=n_words))
+
+
+def post(path, weight=1, **kwargs):
+    return {"method": "POST", "path": path, "weight": weight, **kwargs}
+
+
+def get(path, weight=1, **kwargs):
+    return {"method": "GET", "path": path, "weight": weight, **kwargs}
+
+
+# Each mix is a function rng -> list of weighted requests. Texts are random,
+# so caches only help as much as they would with real traffic
+SCENARIOS = {
+    "penguin_api": {
+        "chapter": "1_Chapter",
+        "mixes": {"default": lambda rng: [post("/predict", json=PENGUIN)]},
+    },
+    "coffee_api": {
+        "chapter": "1_Chapter",
+        "mixes": {"default": lambda rng: [post("/predict", json={"aroma": 7.5, "flavor": 8.0, "altitude": 1500})]},
+    },
+    "diabetes": {
+        "chapter": "1_Chapter",
+        "mixes": {"default": lambda rng: [post("/predict", json={"age": 50, "bmi": 28.5, "blood_pressure": 80.0})]},
+    },
+    "model_info": {
+        "chapter": "1_Chapter",
+        # Throwaway registry, filled with 1000 models before the test
+        "env": lambda tmp: {"MODEL_REGISTRY_DB": str(Path(tmp) / "model_registry.db")},
+        "setup": [post("/register-models", json=[
+            {"model_id": i, "model_name": f"model-{i}", "description": f"Model number {i}"}
+            for i in range(1, 1001)
+        ])],
+        "mixes": {"default": lambda rng: [get(f"/model-info/{rng.randint(1, 1000)}", weight=8),
+                                          get("/models", params={"limit": 50}, weight=2)]},
+    },
+    "main_ml_api": {
+        "chapter": "2_Chapter",
+        "mixes": {"default": lambda rng: [post("/analyze", json={"text": sentence(rng)})]},
+    },
+    "main_scorer_api": {
+        "chapter": "2_Chapter",
+        "mixes": {
+            "default": lambda rng: [post("/predict_trust", json={
+                "length": rng.randint(1, 2000), "user_reputation": rng.randint(0, 500), "report_count": rng.randint(0, 5)})],
+            "batch": lambda rng: [post("/predict_trust/batch", json={"comments": [
+                {"length": rng.randint(1, 2000), "user_reputation": rng.randint(0, 500), "report_count": rng.randint(0, 5)}
+                for _ in range(100)]})],
+        },
+    },
+    "main_text_api": {
+        "chapter": "2_Chapter",
+        "mixes": {
+            "default": lambda rng: [post("/analyze_comment", params={"text": sentence(rng, 30)})],
+            "batch": lambda rng: [post("/analyze_comments", json={"texts": [sentence(rng, 30) for _ in range(100)]})],
+        },
+    },
+    "main_validate_api": {
+        "chapter": "2_Chapter",
+        "mixes": {"default": lambda rng: [
+            post("/register", weight=9, json={"username": "john_doe", "email": "john@mode360.com", "age": 25}),
+            post("/register", weight=1, json={"username": "john", "email": "john@hacker.com", "age": 25}),
+        ]},
+    },
+    "main_key_api": {
+        "chapter": "3_Chapter",
+        "mixes": {"default": lambda rng: [get(f"/items/A{rng.randint(1, 3)}")]},
+    },
+    "main_secure_api": {
+        "chapter": "3_Chapter",
+        "mixes": {"default": lambda rng: [post("/predict", json={"text": sentence(rng)})]},
+    },
+    "main_rate_limit_api": {
+        "chapter": "3_Chapter",
+        "mixes": {"default": lambda rng: [post("/predict", json={"text": sentence(rng)})]},
+    },
+    "main_async_api": {
+        "chapter": "3_Chapter",
+        "mixes": {
+            "default": lambda rng: [post("/analyze", json={"text": sentence(rng)})],
+            "stream": lambda rng: [post("/analyze/stream", content="\n".join(
+                json.dumps({"text": sentence(rng)}) for _ in range(200)).encode())],
+        },
+    },
+    "main_timeout_api": {
+        "chapter": "3_Chapter",
+        "mixes": {"default": lambda rng: [post("/analyze_reviews", json={"text": sentence(rng)})]},
+    },
+    "main_input_validation": {
+        "chapter": "4_Chapter",
+        "mixes": {"default": lambda rng: [
+            post("/v1/register_inventory", weight=4, json={"name": "apple", "quantity": rng.randint(0, 100)}),
+            post("/v1/register_batch", weight=1, json={"job_name": "job", "inputs": [
+                {"latitude": 40.4, "longitude": -3.7, "date": "2024-01-01"} for _ in range(50)]}),
+        ]},
+    },
+    "main_versioning_api": {
+        "chapter": "4_Chapter",
+        "mixes": {"default": lambda rng: [post("/v1/penguin_classifier", json=PENGUIN),
+                                          post("/v2/penguin_classifier", json={"data": PENGUIN_ROWS[0]})]},
+    },
+    "main_log_monitor_api": {
+        "chapter": "4_Chapter",
+        # Keep the (sampled) request log, but out of the terminal
+        "env": lambda tmp: {"REQUEST_LOG_PATH": str(Path(tmp) / "requests.log")},
+        "mixes": {
+            "default": lambda rng: [post("/v1/penguin_classifier", weight=5, json=PENGUIN),
+                                    post("/v2/penguin_classifier", weight=4, json={"data": PENGUIN_ROWS[1]}),
+                                    get("/health", weight=1)],
+            "batch": lambda rng: [post("/v2/penguin_classifier", json={
+                "data": "\n".join(rng.choices(PENGUIN_ROWS, k=1000))})],
+        },
+    },
+}
+
+
+# --- Runs inside the app's subprocess ---------------------------------------
+
+def load_app(name: str):
+    """
+    Import the app from the current (chapter) directory and wrap its lifespan
+    to lift the rate limits and report the API key once startup is done
+    """
+    module = __import__(name)
+    app = module.app
+    original = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with original(app) as state:
+            for helpers in ("sentiment_model", "penguin_model"):
+                helpers = sys.modules.get(helpers)
+                if helpers is not None and hasattr(helpers, "initialize_rate_limiter"):
+                    helpers.initialize_rate_limiter(10**9)
+            print(RESULT_PREFIX + json.dumps({"ready": True, "api_key": api_key(module)}), flush=True)
+            yield state
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def api_key(module) -> str:
+    for candidate in (module, sys.modules.get("sentiment_model"), sys.modules.get("penguin_model")):
+        for attr in ("API_KEY", "API_SECRET_KEY"):
+            value = getattr(candidate, attr, None)
+            if isinstance(value, str):
+                return value
+    return os.getenv("API_KEY", "default_secret_key")
+
+
+def build_requests(name: str, mix: str, n: int = 1000, seed: int = 0) -> list:
+    # Pre-generate the request sequence so building payloads is not measured
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(n):
+        choices = SCENARIOS[name]["mixes"][mix](rng)
+        requests.append(rng.choices(choices, [request["weight"] for request in choices])[0])
+    return requests
+
+
+async def send(client, request: dict, key: str) -> int:
+    response = await client.request(
+        request["method"], request["path"], json=request.get("json"),
+        params=request.get("params"), content=request.get("content"),
+        headers={"X-API-Key": key},
+    )
+    return response.status_code
+
+
+async def drive(client, requests: list, key: str, concurrency: int, duration: float,
+                warmup: float, cpu_seconds) -> dict:
+    """
+    `concurrency` clients send requests back to back; only requests that
+    finish after the warmup and before the end of the test are recorded
+    """
+    latencies = []
+    statuses = Counter()
+    measuring = False
+    stopping = False
+
+    async def client_loop(i):
+        k = i
+        while not stopping:
+            request = requests[k % len(requests)]
+            k += concurrency
+            start = time.perf_counter()
+            try:
+                status = await send(client, request, key)
+            except Exception as e:
+                status = type(e).__name__
+            if measuring:
+                latencies.append(time.perf_counter() - start)
+                statuses[str(status)] += 1
+
+    tasks = [asyncio.create_task(client_loop(i)) for i in range(concurrency)]
+    await asyncio.sleep(warmup)
+    measuring = True
+    cpu_start, start = cpu_seconds(), time.perf_counter()
+    await asyncio.sleep(duration)
+    measuring = False
+    elapsed, cpu = time.perf_counter() - start, cpu_seconds()
+    stopping = True
+    await asyncio.gather(*tasks)
+    return summarize(latencies, statuses, elapsed, None if cpu is None else cpu - cpu_start)
+
+
+def summarize(latencies: list, statuses: Counter, elapsed: float, cpu: float) -> dict:
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else None
+
+    count = len(latencies)
+    return {
+        "requests": count,
+        "rps": count / elapsed,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+        "cpu_ms_per_request": cpu / count * 1000 if cpu is not None and count else None,
+        "status": dict(statuses),
+    }
+
+
+async def run_asgi(name: str, args) -> list:
+    import httpx
+    app = load_app(name)
+    results = []
+    async with app.router.lifespan_context(app):
+        key = api_key(sys.modules[name])
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            for request in SCENARIOS[name].get("setup", []):
+                await send(client, request, key)
+            requests = build_requests(name, args.mix)
+            for concurrency in args.concurrency:
+                result = await drive(client, requests, key, concurrency, args.duration,
+                                     args.warmup, time.process_time)
+                results.append({"concurrency": concurrency, **result})
+    return results
+
+
+def serve(name: str, fd: int):
+    import uvicorn
+    app = load_app(name)
+    # NOTE: socket.socket(fileno=...) detects the address family; uvicorn's
+    # own fd option assumes a Unix socket and would skip TCP_NODELAY
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    server.run(sockets=[socket.socket(fileno=fd)])
+
+
+# --- Runs in the parent -----------------------------------------------------
+
+def tree_cpu_seconds(pids):
+    """
+    CPU time (user + system) of the processes and all their descendants,
+    from /proc; None where /proc is not available
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    ticks, seen, stack = 0, set(), list(pids)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def wait_ready(process) -> dict:
+    for line in process.stdout:
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Server exited with code {process.wait()}")
+
+
+def subprocess_env(name: str, tmp: str) -> dict:
+    chapter = ROOT / SCENARIOS[name]["chapter"]
+    env = {**os.environ, "PYTHONPATH": str(chapter)}
+    if "env" in SCENARIOS[name]:
+        env.update(SCENARIOS[name]["env"](tmp))
+    return env
+
+
+def run_uvicorn(name: str, args, tmp: str) -> list:
+    import httpx
+    chapter = ROOT / SCENARIOS[name]["chapter"]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    port = sock.getsockname()[1]
+
+    # NOTE: every worker imports the app and runs its lifespan, like
+    # `uvicorn --workers`, and accepts connections on the shared socket
+    servers = [subprocess.Popen(
+        [sys.executable, __file__, "--serve", name, "--fd", str(sock.fileno())],
+        cwd=chapter, env=subprocess_env(name, tmp), pass_fds=(sock.fileno(),),
+        stdout=subprocess.PIPE, text=True,
+    ) for _ in range(args.workers)]
+    try:
+        key = [wait_ready(server) for server in servers][0]["api_key"]
+
+        async def main():
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+                for request in SCENARIOS[name].get("setup", []):
+                    await send(client, request, key)
+                requests = build_requests(name, args.mix)
+                pids = [server.pid for server in servers]
+                results = []
+                for concurrency in args.concurrency:
+                    result = await drive(client, requests, key, concurrency, args.duration,
+                                         args.warmup, lambda: tree_cpu_seconds(pids))
+                    results.append({"concurrency": concurrency, **result})
+                return results
+
+        return asyncio.run(main())
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait()
+        sock.close()
+
+
+def run_scenario(name: str, args) -> list:
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.mode == "uvicorn":
+            return run_uvicorn(name, args, tmp)
+        command = [sys.executable, __file__, "--run-asgi", name, "--mix", args.mix,
+                   "--duration", str(args.duration), "--warmup", str(args.warmup),
+                   "--concurrency", *map(str, args.concurrency)]
+        process = subprocess.run(command, cwd=ROOT / SCENARIOS[name]["chapter"],
+                                 env=subprocess_env(name, tmp), capture_output=True, text=True)
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        payloads = [json.loads(line[len(RESULT_PREFIX):]) for line in lines]
+        results = [payload for payload in payloads if "results" in payload]
+        if process.returncode != 0 or not results:
+            raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip()
+                               else f"exit code {process.returncode}")
+        return results[0]["results"]
+
+
+def fmt(value, spec=".1f"):
+    return "-" if value is None else format(value, spec)
+
+
+def print_result(key: str, r: dict):
+    errors = sum(count for status, count in r["status"].items() if not status.startswith("2"))
+    print(f"{key:<44}{fmt(r['rps'], '.0f'):>9}{fmt(r['p50_ms'], '.2f'):>9}{fmt(r['p95_ms'], '.2f'):>9}"
+          f"{fmt(r['p99_ms'], '.2f'):>9}{fmt(r['cpu_ms_per_request'], '.3f'):>11}{errors:>8}")
+
+
+# Metric -> True if higher is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "cpu_ms_per_request": False}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Return (key, metric, baseline, current, change %) for every metric that
+    got worse by more than `threshold` percent
+    """
+    regressions = []
+    for key, result in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((key, metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--list", action="store_true", help="List the apps and their payload mixes")
+    parser.add_argument("--apps", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS), metavar="APP")
+    parser.add_argument("--mix", default="default", help="Payload mix (apps without it are skipped)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each level")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=0, help="uvicorn port (0 = any free port)")
+    parser.add_argument("--save", help="Write the results to this JSON baseline file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+    # Internal: used by the parent process to start the app subprocesses
+    parser.add_argument("--run-asgi", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--fd", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_asgi:
+        results = asyncio.run(run_asgi(args.run_asgi, args))
+        print(RESULT_PREFIX + json.dumps({"results": results}), flush=True)
+        return
+    if args.serve:
+        serve(args.serve, args.fd)
+        return
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<24}{scenario['chapter']:<12}{', '.join(scenario['mixes'])}")
+        return
+
+    print(f"mode={args.mode} workers={args.workers} duration={args.duration}s "
+          f"CPUs={os.cpu_count()} python={platform.python_version()}")
+    print(f"{'app/mix/concurrency':<44}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'cpu ms/req':>11}{'non-2xx':>8}")
+    current = {}
+    for name in args.apps:
+        if args.mix not in SCENARIOS[name]["mixes"]:
+            continue
+        try:
+            results = run_scenario(name, args)
+        except Exception as e:
+            print(f"{name + '/' + args.mix:<44}[ERROR] {e}")
+            continue
+        for result in results:
+            key = f"{name}/{args.mix}/c{result['concurrency']}"
+            current[key] = result
+            print_result(key, result)
+
+    meta = {"mode": args.mode, "workers": args.workers, "duration": args.duration,
+            "cpus": os.cpu_count(), "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if args.save:
+        Path(args.save).write_text(json.dumps({"meta": meta, "results": current}, indent=2))
+        print(f"[INFO] Results saved to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        for setting in ("mode", "workers", "cpus"):
+            if baseline["meta"].get(setting) != meta.get(setting):
+                print(f"[WARNING] Baseline {setting} is {baseline['meta'].get(setting)}, "
+                      f"this run used {meta.get(setting)}")
+        regressions = compare(baseline["results"], current, args.threshold)
+        for key, metric, old, new, change in regressions:
+            print(f"[REGRESSION] {key} {metric}: {old:.3f} -> {new:.3f} ({change:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"[INFO] No regressions beyond {args.threshold}% against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Microbenchmarks for the per-request hot paths
+
+Times the model calls, the rate limiter, API key checking and Pydantic
+validation in isolation, so a slow request can be traced to its parts.
+Every benchmark is warmed up, then timed in `--samples` samples of enough
+calls to last at least `--min-time` seconds each (with the garbage
+collector off, like timeit). The report gives the mean time per operation
+with a 95% confidence interval, the median and fastest sample, the memory
+blocks (and bytes) allocated per operation that are still alive when it
+returns (its result, caches, leaks) and the peak traced memory of one call,
+which also covers its temporaries.
+
+Rows are printed in a fixed order and format, so two runs can be compared
+with diff (--format json for tools).
+
+Usage:
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py -k RateLimiter --samples 30 > before.txt
+    python benchmarks/microbench.py --sizes 1 1000 --format json > results.json
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "MICROBENCH "
+
+PENGUIN = {"bill_length_mm": 39.1, "bill_depth_mm": 18.7, "flipper_length_mm": 181, "body_mass_g": 3750}
+PENGUIN_ROW = "39.1 18.7 181 3750"
+
+# Calls whose results are kept while counting allocations; the allocations of
+# tracemalloc itself (its snapshots) are left out
+ALLOCATION_CALLS = 100
+SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+# Two-sided 95% Student t quantiles for small sample counts (df -> t)
+T_95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26,
+        10: 2.23, 15: 2.13, 20: 2.09, 30: 2.04}
+
+
+def t_quantile(df: int) -> float:
+    eligible = [d for d in T_95 if d <= df]
+    return T_95[max(eligible)] if eligible and df <= 30 else 1.96
+
+
+# --- Benchmarks, grouped by the chapter they are imported from --------------
+# Each function returns a list of (name, ops per call, zero-argument callable)
+
+def chapter_2(args):
+    from main_scorer_api import CommentScorer
+    import numpy as np
+    scorer = CommentScorer()
+    features = np.array([[150, 100, 0]])
+    return [("CommentScorer.predict", 1, lambda: scorer.predict(features))]
+
+
+def chapter_3(args):
+    import sentiment_model
+    from rate_limiting import create_rate_limiter
+
+    analyzer = sentiment_model.SentimentAnalyzer()
+    text = "I love this product, the quality is fantastic but delivery was slow"
+    benchmarks = [("SentimentAnalyzer.__call__", 1, lambda: analyzer(text))]
+
+    # Known key, rate limiter that never rejects, as in a normal request
+    sentiment_model.initialize_rate_limiter(10**9)
+    key = sentiment_model.API_KEY
+    benchmarks.append(("test_api_key", 1, lambda: sentiment_model.test_api_key(key)))
+
+    for n_keys in args.keys:
+        limiter = create_rate_limiter(10**9)
+        keys = [f"key-{i}" for i in range(n_keys)]
+        for k in keys:
+            limiter.is_rate_limited(k)
+        # 1000 calls spread over the existing keys per timed call
+        sample = [keys[(i * 7919) % n_keys] for i in range(1000)]
+
+        def calls(limiter=limiter, sample=sample):
+            for k in sample:
+                limiter.is_rate_limited(k)
+        benchmarks.append((f"RateLimiter.is_rate_limited[keys={n_keys}]", len(sample), calls))
+    return benchmarks
+
+
+def single_row_penguin_v2():
+    # v2 model as it was before multi-row requests (one row, three validators),
+    # the reference for validate.PenguinV2[rows=1]
+    from fastapi import HTTPException
+    from pydantic import BaseModel, model_validator
+
+    class SingleRowPenguinV2(BaseModel):
+        data: str
+
+        @model_validator(mode="after")
+        def check_non_empty(self):
+            if not self.data.strip():
+                raise HTTPException(status_code=400, detail="Data must not be empty.")
+            return self
+
+        @model_validator(mode="after")
+        def check_data_format(self):
+            if not len(self.data.split()) == 4:
+                raise HTTPException(status_code=400, detail="Data must contain exactly 4 space-separated values.")
+            return self
+
+        @model_validator(mode="after")
+        def check_positive_values(self):
+            for value in self.data.split():
+                if float(value) <= 0:
+                    raise HTTPException(status_code=400, detail="All measurements must be positive values.")
+            return self
+    return SingleRowPenguinV2
+
+
+def chapter_4(args):
+    from pydantic import TypeAdapter
+    from penguin_model import PenguinClassifier
+    from main_log_monitor_api import PenguinV1, PenguinV2
+    from main_input_validation import BatchInput
+
+    classifier = PenguinClassifier()
+    penguin = PenguinV1(**PENGUIN)
+    benchmarks = [("PenguinClassifier.__call__", 1, lambda: classifier(features=penguin))]
+
+    penguins = TypeAdapter(list[PenguinV1])
+    for n in args.sizes:
+        records = [PENGUIN] * n
+        benchmarks.append((f"validate.PenguinV1[n={n}]", n, lambda records=records: penguins.validate_python(records)))
+    for n in args.sizes:
+        # One request with n rows
+        payload = {"data": "\n".join([PENGUIN_ROW] * n)}
+        benchmarks.append((f"validate.PenguinV2[rows={n}]", n, lambda payload=payload: PenguinV2.model_validate(payload)))
+    reference = single_row_penguin_v2()
+    benchmarks.append(("validate.PenguinV2.single_row_reference[rows=1]", 1,
+                       lambda payload={"data": PENGUIN_ROW}: reference.model_validate(payload)))
+    for n in args.sizes:
+        payload = {"job_name": "job", "inputs": [{"latitude": 40.4, "longitude": -3.7, "date": "2024-01-01"}] * n}
+        benchmarks.append((f"validate.BatchInput[inputs={n}]", n, lambda payload=payload: BatchInput.model_validate(payload)))
+    return benchmarks
+
+
+CHAPTERS = {"2_Chapter": chapter_2, "3_Chapter": chapter_3, "4_Chapter": chapter_4}
+
+
+# --- Measurement ------------------------------------------------------------
+
+def measure(fn, ops: int, samples: int, min_time: float, warmup: float) -> dict:
+    # Warm up, and find how many calls make a sample of at least min_time
+    loops, deadline = 1, time.perf_counter() + warmup
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and time.perf_counter() >= deadline:
+            break
+        if elapsed < min_time:
+            loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(samples):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            times.append((time.perf_counter() - start) / (loops * ops) * 1e9)
+
+        tracemalloc.start()
+        try:
+            # Allocations alive after the calls, from tracemalloc snapshots.
+            # The results are kept, so what each call returns is counted too
+            results = [None] * ALLOCATION_CALLS
+            fn()
+            before = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            for i in range(ALLOCATION_CALLS):
+                results[i] = fn()
+            after = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            del results
+            allocated = after.compare_to(before, "filename")
+
+            # Peak traced memory during a single call
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    mean = statistics.fmean(times)
+    half_width = t_quantile(samples - 1) * statistics.stdev(times) / math.sqrt(samples) if samples > 1 else math.nan
+    return {
+        "ops": ops,
+        "loops": loops,
+        "mean_ns": mean,
+        "ci95_pct": half_width / mean * 100,
+        "median_ns": statistics.median(times),
+        "min_ns": min(times),
+        "allocs_per_op": sum(stat.count_diff for stat in allocated) / (ALLOCATION_CALLS * ops),
+        "alloc_bytes_per_op": sum(stat.size_diff for stat in allocated) / (ALLOCATION_CALLS * ops),
+        "peak_bytes_per_call": peak,
+    }
+
+
+def run_chapter(chapter: str, args) -> dict:
+    results = {}
+    for name, ops, fn in CHAPTERS[chapter](args):
+        full_name = f"{chapter}/{name}"
+        if args.k and args.k not in full_name:
+            continue
+        results[full_name] = measure(fn, ops, args.samples, args.min_time, args.warmup)
+    return results
+
+
+def format_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.3g} {unit}"
+    return f"{ns:.3g} ns"
+
+
+def print_text(results: dict):
+    print(f"{'benchmark':<60}{'mean/op':>11}{'±95%':>8}{'median/op':>11}{'min/op':>11}"
+          f"{'allocs/op':>11}{'bytes/op':>11}{'peak/call':>11}")
+    for name, r in results.items():
+        print(f"{name:<60}{format_ns(r['mean_ns']):>11}{r['ci95_pct']:>7.1f}%{format_ns(r['median_ns']):>11}"
+              f"{format_ns(r['min_ns']):>11}{r['allocs_per_op']:>11.2f}{r['alloc_bytes_per_op']:>11.1f}"
+              f"{r['peak_bytes_per_call'] / 1024:>8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000, 100_000],
+                        help="Input counts for the validation benchmarks")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 10_000, 1_000_000],
+                        help="Distinct API keys held by the rate limiter")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.02, help="Minimum seconds per sample")
+    parser.add_argument("--warmup", type=float, default=0.2, help="Seconds of warmup per benchmark")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    # Internal: run the benchmarks of one chapter (in that chapter's directory)
+    parser.add_argument("--chapter", choices=list(CHAPTERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.chapter:
+        print(RESULT_PREFIX + json.dumps(run_chapter(args.chapter, args)), flush=True)
+        return
+
+    # Each chapter runs in its own process: module names such as
+    # sentiment_model repeat across chapters
+    results = {}
+    for chapter in CHAPTERS:
+        process = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], "--chapter", chapter],
+            cwd=ROOT / chapter, env={**os.environ, "PYTHONPATH": str(ROOT / chapter)},
+            capture_output=True, text=True,
+        )
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if process.returncode != 0 or not lines:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode
+            print(f"[ERROR] {chapter}: {error}", file=sys.stderr)
+            continue
+        results.update(json.loads(lines[-1][len(RESULT_PREFIX):]))
+
+    if args.format == "json":
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print_text(results)
+
+
+if __name__ == "__main__":
+    main()
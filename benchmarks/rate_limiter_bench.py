@@ -0,0 +1,116 @@
+"""
+Microbenchmark for the rate limiters in 3_Chapter/rate_limiting.py
+
+Measures the cost per `is_rate_limited` call and the memory held by the
+limiter state as the number of distinct API keys grows, and compares the
+constant-time algorithms with the previous timestamp-list implementation.
+
+Usage:
+    python benchmarks/rate_limiter_bench.py --keys 1000000 --calls 200000
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "3_Chapter"))
+from rate_limiting import ALGORITHMS  # noqa: E402
+
+
+class LegacyRateLimiter:
+    """
+    Timestamp-list sliding window used before rate_limiting.py (baseline)
+    """
+    def __init__(self, requests_per_minute: int = 10):
+        self.requests_per_minute = requests_per_minute
+        self.requests = defaultdict(list)
+
+    def is_rate_limited(self, api_key: str) -> tuple[bool, int]:
+        now = datetime.now()
+        minute_ago = now - timedelta(minutes=1)
+        self.requests[api_key] = [
+            req_time for req_time in self.requests[api_key]
+            if req_time > minute_ago
+        ]
+        recent_requests = len(self.requests[api_key])
+        if recent_requests >= self.requests_per_minute:
+            return True, 0
+        self.requests[api_key].append(now)
+        return False, self.requests_per_minute - recent_requests - 1
+
+
+def bench(name, limiter_cls, n_keys, n_calls, n_single_calls, requests_per_minute):
+    keys = [f"key-{i}" for i in range(n_keys)]
+
+    # Memory held by the state after seeing every key once (idle keys may
+    # already have been evicted)
+    limiter = limiter_cls(requests_per_minute=requests_per_minute)
+    tracemalloc.start()
+    for key in keys:
+        limiter.is_rate_limited(key)
+    state_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # First call for every key
+    limiter = limiter_cls(requests_per_minute=requests_per_minute)
+    start = time.perf_counter()
+    for key in keys:
+        limiter.is_rate_limited(key)
+    populate = time.perf_counter() - start
+
+    # Hot path: random keys from the populated set
+    rng = random.Random(0)
+    sample = [keys[rng.randrange(n_keys)] for _ in range(n_calls)]
+    start = time.perf_counter()
+    for key in sample:
+        limiter.is_rate_limited(key)
+    hot = time.perf_counter() - start
+
+    # A single busy key under a high limit (the old list grows with every call)
+    start = time.perf_counter()
+    for _ in range(n_single_calls):
+        limiter.is_rate_limited("single")
+    single = time.perf_counter() - start
+
+    return {
+        "algorithm": name,
+        "keys": n_keys,
+        "populate_ns_per_call": populate / n_keys * 1e9,
+        "random_key_ns_per_call": hot / n_calls * 1e9,
+        "single_key_ns_per_call": single / n_single_calls * 1e9,
+        "state_bytes_per_key": state_bytes / n_keys,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--single-calls", type=int, default=5_000,
+                        help="Calls on one key (quadratic for the legacy limiter)")
+    parser.add_argument("--requests-per-minute", type=int, default=1_000_000,
+                        help="High per-key limit, the case where the old list grows the most")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    limiters = dict(ALGORITHMS)
+    if not args.skip_legacy:
+        limiters["legacy_list"] = LegacyRateLimiter
+
+    print(f"{'algorithm':<16}{'keys':>10}{'populate ns':>14}{'random ns':>12}"
+          f"{'single ns':>12}{'bytes/key':>12}")
+    for n_keys in args.keys:
+        for name, limiter_cls in limiters.items():
+            r = bench(name, limiter_cls, n_keys, args.calls, args.single_calls,
+                      args.requests_per_minute)
+            print(f"{r['algorithm']:<16}{r['keys']:>10}{r['populate_ns_per_call']:>14.0f}"
+                  f"{r['random_key_ns_per_call']:>12.0f}{r['single_key_ns_per_call']:>12.0f}"
+                  f"{r['state_bytes_per_key']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Response serialization: Pydantic response models vs trusted JSON bytes
+
+Sends the same requests to each endpoint in process (httpx ASGITransport)
+with the three response paths of fast_json.py, switched at runtime:
+
+- validated: RESPONSE_VALIDATION=true, the previous path (tolist, response
+  model, jsonable_encoder, json.dumps)
+- json: TrustedJSONResponse encoded with the json module
+- orjson: TrustedJSONResponse with orjson, NumPy arrays serialized natively
+  (only when orjson is installed)
+
+and reports the median and mean latency per request, the speedup of each
+path over "validated" and the response size. The responses of the three
+paths are checked to be identical.
+
+Usage:
+    python benchmarks/response_serialization_bench.py
+    python benchmarks/response_serialization_bench.py --rows 1 1000 100000 --duration 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "RESPONSEBENCH "
+API_KEY = "default_secret_key"
+
+PENGUIN = {"bill_length_mm": 39.1, "bill_depth_mm": 18.7, "flipper_length_mm": 181, "body_mass_g": 3750}
+PENGUIN_ROWS = ["39.1 18.7 181 3750", "46.5 15.2 216 5000", "50.0 19.5 196 3900"]
+
+
+# --- Endpoints, grouped by the chapter app they are served from -------------
+# Each function returns the app module and a list of (name, path, json body)
+
+def chapter_3(args):
+    import main_async_api
+    return main_async_api, [
+        ("3_Chapter /analyze", "/analyze", {"text": "I love this product, the quality is fantastic"}),
+    ]
+
+
+def chapter_4(args):
+    import main_log_monitor_api
+    cases = [("4_Chapter /v1/penguin_classifier", "/v1/penguin_classifier", PENGUIN)]
+    for n in args.rows:
+        data = "\n".join(PENGUIN_ROWS[i % len(PENGUIN_ROWS)] for i in range(n))
+        cases.append((f"4_Chapter /v2/penguin_classifier[rows={n}]", "/v2/penguin_classifier", {"data": data}))
+    return main_log_monitor_api, cases
+
+
+CHAPTERS = {"3_Chapter": chapter_3, "4_Chapter": chapter_4}
+
+
+# --- Measurement ------------------------------------------------------------
+
+def use_path(fast_json, path: str, orjson_module):
+    fast_json.RESPONSE_VALIDATION = path == "validated"
+    fast_json.orjson = orjson_module if path == "orjson" else None
+
+
+async def time_requests(client, path: str, body: dict, duration: float) -> list:
+    # At least 5 requests, then until `duration` seconds have passed
+    latencies, deadline = [], time.perf_counter() + duration
+    while len(latencies) < 5 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post(path, json=body, headers={"X-API-Key": API_KEY})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status_code} {response.text[:200]}")
+    return latencies
+
+
+async def run_chapter(chapter: str, args) -> dict:
+    import httpx
+    import fast_json
+    app_module, cases = CHAPTERS[chapter](args)
+    paths = ["validated", "json"] + (["orjson"] if fast_json.orjson is not None else [])
+    orjson_module = fast_json.orjson
+    app = app_module.app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        app_module.initialize_rate_limiter(10**9)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, path, body in cases:
+                if args.k and args.k not in name:
+                    continue
+                # Same response bytes on every path
+                bodies = set()
+                for response_path in paths:
+                    use_path(fast_json, response_path, orjson_module)
+                    response = await client.post(path, json=body, headers={"X-API-Key": API_KEY})
+                    bodies.add(json.dumps(response.json(), sort_keys=True))
+                if len(bodies) != 1:
+                    raise RuntimeError(f"{name}: the response paths return different bodies")
+
+                results[name] = {"bytes": len(response.content)}
+                for response_path in paths:
+                    use_path(fast_json, response_path, orjson_module)
+                    await time_requests(client, path, body, args.warmup)
+                    latencies = await time_requests(client, path, body, args.duration)
+                    results[name][response_path] = {
+                        "requests": len(latencies),
+                        "median_ms": statistics.median(latencies) * 1000,
+                        "mean_ms": statistics.fmean(latencies) * 1000,
+                    }
+    return results
+
+
+def print_text(results: dict):
+    print(f"{'endpoint':<44}{'path':>10}{'median':>11}{'mean':>11}{'speedup':>9}{'size':>11}")
+    for name, r in results.items():
+        base = r["validated"]["median_ms"]
+        for response_path in ("validated", "json", "orjson"):
+            if response_path not in r:
+                continue
+            stats = r[response_path]
+            print(f"{name:<44}{response_path:>10}{stats['median_ms']:>8.3f} ms{stats['mean_ms']:>8.3f} ms"
+                  f"{base / stats['median_ms']:>8.2f}x{r['bytes'] / 1024:>7.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", help="Only run endpoints whose name contains this text")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10_000],
+                        help="Rows per /v2/penguin_classifier request")
+    parser.add_argument("--duration", type=float, default=1.0, help="Seconds per endpoint and path")
+    parser.add_argument("--warmup", type=float, default=0.2, help="Seconds of warmup per endpoint and path")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    # Internal: run the endpoints of one chapter (in that chapter's directory)
+    parser.add_argument("--chapter", choices=list(CHAPTERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.chapter:
+        results = asyncio.run(run_chapter(args.chapter, args))
+        print(RESULT_PREFIX + json.dumps(results), flush=True)
+        return
+
+    # Each chapter runs in its own process: module names such as
+    # sentiment_model repeat across chapters
+    results = {}
+    for chapter in CHAPTERS:
+        process = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], "--chapter", chapter],
+            cwd=ROOT / chapter, env={**os.environ, "PYTHONPATH": str(ROOT / chapter)},
+            capture_output=True, text=True,
+        )
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if process.returncode != 0 or not lines:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode
+            print(f"[ERROR] {chapter}: {error}", file=sys.stderr)
+            continue
+        results.update(json.loads(lines[-1][len(RESULT_PREFIX):]))
+
+    if args.format == "json":
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print_text(results)
+
+
+if __name__ == "__main__":
+    main()
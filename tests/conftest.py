@@ -0,0 +1,16 @@
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_chapter_module(chapter: str, name: str):
+    """
+    Import `name`.py from a chapter directory under a unique module name, so
+    the per-chapter copies of a module can be tested side by side
+    """
+    path = ROOT / chapter / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(f"{chapter}_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
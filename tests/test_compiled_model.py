@@ -0,0 +1,106 @@
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from conftest import load_chapter_module
+
+N_FEATURES = 6
+
+
+@pytest.fixture(params=["1_Chapter", "3_Chapter"], scope="module")
+def compiled_model(request):
+    return load_chapter_module(request.param, "compiled_model")
+
+
+def fit(estimator, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, N_FEATURES))
+    y = (X[:, 0] * 3 + X[:, 1] - X[:, 2]).round().astype(int) % n_classes
+    with warnings.catch_warnings():
+        # multi_class is deprecated in newer scikit-learn versions
+        warnings.simplefilter("ignore", FutureWarning)
+        return estimator.fit(X, y)
+
+
+CLASSIFIERS = {
+    "binary": lambda: fit(LogisticRegression(), 2),
+    "binary_multinomial": lambda: fit(LogisticRegression(multi_class="multinomial"), 2),
+    "binary_liblinear": lambda: fit(LogisticRegression(solver="liblinear"), 2),
+    "multiclass": lambda: fit(LogisticRegression(), 3),
+    "multiclass_ovr": lambda: fit(LogisticRegression(multi_class="ovr"), 3),
+    "multiclass_liblinear": lambda: fit(LogisticRegression(solver="liblinear"), 3),
+}
+
+
+def inputs(seed=1):
+    rng = np.random.default_rng(seed)
+    return {
+        "random": rng.normal(scale=10, size=(500, N_FEATURES)),
+        "zeros": np.zeros((1, N_FEATURES)),
+        "large": rng.normal(scale=1e6, size=(100, N_FEATURES)),
+        "tiny": rng.normal(scale=1e-12, size=(50, N_FEATURES)),
+    }
+
+
+@pytest.mark.parametrize("name", CLASSIFIERS)
+@pytest.mark.parametrize("input_name", inputs())
+def test_classifier_matches_sklearn(compiled_model, name, input_name):
+    estimator = CLASSIFIERS[name]()
+    compiled = compiled_model.CompiledLinearModel.from_estimator(estimator)
+    X = inputs()[input_name]
+
+    assert np.array_equal(compiled.predict(X), estimator.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), estimator.predict_proba(X), rtol=1e-9, atol=1e-12)
+
+    labels, proba = compiled.predict_with_proba(X)
+    assert np.array_equal(labels, estimator.predict(X))
+    np.testing.assert_allclose(proba, estimator.predict_proba(X), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("name", CLASSIFIERS)
+def test_compile_model_does_not_fall_back(compiled_model, name):
+    # A compiled model that disagrees with sklearn would silently fall back
+    estimator = CLASSIFIERS[name]()
+    assert compiled_model.compile_model(estimator, backend="compiled").backend == "compiled"
+
+
+def test_binary_multinomial_uses_softmax(compiled_model):
+    estimator = CLASSIFIERS["binary_multinomial"]()
+    compiled = compiled_model.CompiledLinearModel.from_estimator(estimator)
+    assert compiled.multinomial
+    X = inputs()["random"]
+    # Softmax of (-logit, logit), not a sigmoid of the logit
+    logit = estimator.decision_function(X)
+    expected = np.exp(logit) / (np.exp(-logit) + np.exp(logit))
+    np.testing.assert_allclose(compiled.predict_proba(X)[:, 1], expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("input_name", inputs())
+def test_regressor_matches_sklearn(compiled_model, input_name):
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(size=(200, N_FEATURES))
+    estimator = LinearRegression().fit(X_train, X_train @ rng.normal(size=N_FEATURES) + 3)
+    compiled = compiled_model.CompiledLinearModel.from_estimator(estimator)
+    X = inputs()[input_name]
+
+    np.testing.assert_allclose(compiled.predict(X), estimator.predict(X), rtol=1e-9, atol=1e-9)
+    with pytest.raises(AttributeError):
+        compiled.predict_proba(X)
+
+
+def test_single_row_and_feature_count(compiled_model):
+    estimator = CLASSIFIERS["multiclass"]()
+    compiled = compiled_model.CompiledLinearModel.from_estimator(estimator)
+    row = inputs()["random"][0]
+
+    assert np.array_equal(compiled.predict(row), estimator.predict(row.reshape(1, -1)))
+    with pytest.raises(ValueError):
+        compiled.predict(np.zeros((1, N_FEATURES + 1)))
+
+
+def test_non_linear_model_falls_back(compiled_model):
+    from sklearn.tree import DecisionTreeClassifier
+    estimator = fit(DecisionTreeClassifier(), 2)
+    assert compiled_model.compile_model(estimator).backend == "sklearn"
@@ -0,0 +1,50 @@
+import asyncio
+import sqlite3
+
+from conftest import load_chapter_module
+
+jobs = load_chapter_module("3_Chapter", "jobs")
+
+
+def predict_batch(texts):
+    if "boom" in texts:
+        raise RuntimeError("model error")
+    return [{"label": "POSITIVE", "confidence": 0.9} for _ in texts]
+
+
+async def run_jobs(manager, *batches):
+    manager.start()
+    try:
+        job_ids = [await manager.submit(texts) for texts in batches]
+        await asyncio.wait_for(manager.queue.join(), timeout=5)
+    finally:
+        await manager.stop()
+    return job_ids
+
+
+def test_workers_survive_a_failing_store(tmp_path):
+    store = jobs.JobStore(tmp_path / "jobs.db")
+
+    def fail_job(job_id, error):
+        raise sqlite3.OperationalError("database is locked")
+
+    store.fail_job = fail_job
+    manager = jobs.JobManager(store, predict_batch, chunk_size=1, workers=1)
+    failed, completed = asyncio.run(run_jobs(manager, ["boom"], ["fine", "great"]))
+    # The single worker went on with the next job after the failed one
+    assert store.get_job(completed)["status"] == "completed"
+    assert len(store.get_results(completed)) == 2
+
+
+def test_finished_jobs_are_deleted_after_their_retention(tmp_path):
+    store = jobs.JobStore(tmp_path / "jobs.db", retention_s=60)
+    manager = jobs.JobManager(store, predict_batch, workers=1)
+    old, recent = asyncio.run(run_jobs(manager, ["fine"], ["great"]))
+    store.create_job("running", 3)
+    with store.conn:
+        store.conn.execute("UPDATE jobs SET updated_at = updated_at - 120 WHERE id IN (?, 'running')", (old,))
+
+    assert store.delete_expired() == 1
+    assert store.get_job(old) is None and store.get_results(old) == []
+    assert store.get_job(recent)["status"] == "completed"
+    assert store.get_job("running")["status"] == "queued"
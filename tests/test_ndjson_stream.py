@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from conftest import load_chapter_module
+
+ndjson_stream = load_chapter_module("3_Chapter", "ndjson_stream")
+
+
+def predict_batch(texts):
+    return [{"label": "POSITIVE", "length": len(text)} for text in texts]
+
+
+async def body(*parts, done: asyncio.Event = None):
+    # Request body chunks; waits on `done` before ending, like a client
+    # that keeps the upload open while it reads the results
+    for part in parts:
+        yield part
+    if done is not None:
+        await done.wait()
+
+
+def results(data: bytes) -> list:
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+def test_results_in_input_order():
+    async def run():
+        chunks = body(b'{"text": "good"}\n"great"\n\n', b'{"text": ""}\nnot json\n"ok', b'ay"')
+        return b"".join([part async for part in ndjson_stream.score_ndjson(chunks, predict_batch, chunk_size=2)])
+
+    lines = results(asyncio.run(run()))
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert [line.get("length") for line in lines] == [4, 5, None, None, 4]
+    assert lines[2]["error"] == "Empty text provided"
+
+
+def test_partial_chunk_is_scored_while_the_client_waits():
+    async def run():
+        done = asyncio.Event()
+        stream = ndjson_stream.score_ndjson(body(b'"a"\n"bb"\n', done=done), predict_batch,
+                                            chunk_size=256, flush_ms=10)
+        # The two lines are answered before the client sends anything else
+        first = await asyncio.wait_for(stream.__anext__(), timeout=2)
+        done.set()
+        rest = [part async for part in stream]
+        return first, rest
+
+    first, rest = asyncio.run(run())
+    assert [line["length"] for line in results(first)] == [1, 2]
+    assert rest == []
@@ -0,0 +1,27 @@
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from conftest import ROOT, load_chapter_module
+
+penguin_api = load_chapter_module("1_Chapter", "penguin_api")
+
+PENGUIN = {"bill_length_mm": 39.1, "bill_depth_mm": 18.7, "flipper_length_mm": 181, "body_mass_g": 3750}
+
+
+def test_predict_does_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        response = penguin_api.predict(penguin_api.PenguinFeatures(**PENGUIN))
+    assert response["predicted_species"] == ["Adelie"]
+
+
+def test_same_predictions_as_the_artifact():
+    pipeline = joblib.load(ROOT / "1_Chapter" / "models" / "penguin_classifier.pkl")
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[44, 17, 200, 4200], scale=[5, 2, 14, 800], size=(500, 4))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    df = pd.DataFrame(X, columns=pipeline.feature_names_in_)
+    assert np.array_equal(penguin_api.model.predict_proba(df.to_numpy()), pipeline.predict_proba(df))
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from conftest import load_chapter_module
+
+penguin_files = load_chapter_module("4_Chapter", "penguin_files")
+
+VALID = "39.1 18.7 181 3750"
+
+
+@pytest.mark.parametrize("n_valid", [2, 50])  # row by row and vectorized
+def test_errors_keep_the_line_of_the_body(n_valid):
+    lines = ["", VALID, "   ", "39.1 18.7 181", VALID, "39.1 18.7 181.5 3750", ""] + [VALID] * n_valid
+    values, errors, line_numbers = penguin_files.parse_rows("\n".join(lines))
+    # Blank lines produce no row, but the other rows keep their line index
+    assert line_numbers.tolist() == [1, 3, 4, 5] + list(range(7, 7 + n_valid))
+    assert values.shape == (len(line_numbers), 4)
+    bad = np.flatnonzero(errors != "")
+    assert line_numbers[bad].tolist() == [3, 5]
+    assert errors[bad].tolist() == [
+        "Data must contain exactly 4 space-separated values.", penguin_files.NOT_INTEGERS
+    ]
+
+
+@pytest.mark.parametrize("n_rows", [1, 50])
+def test_row_by_row_and_vectorized_parsing_agree(n_rows):
+    rows = ["39.1 18.7 181 3750", "0 18.7 181 3750", "nan 18.7 181 3750", "a b c d", "1 2 3"] * n_rows
+    values, errors, _ = penguin_files.parse_rows("\n".join(rows))
+    expected = [penguin_files.parse_row(row.split()) for row in rows]
+    assert errors.tolist() == [error for _, error in expected]
+    np.testing.assert_array_equal(values, np.array([v for v, _ in expected]))
@@ -0,0 +1,123 @@
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 (required to import IterativeImputer)
+from sklearn.impute import IterativeImputer
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+
+from conftest import ROOT, load_chapter_module
+
+pipeline_compiler = load_chapter_module("4_Chapter", "pipeline_compiler")
+
+FEATURES = ["bill_length_mm", "bill_depth_mm", "flipper_length_mm", "body_mass_g"]
+
+
+def fitted_pipeline(seed=0):
+    # Small penguin-like dataset with missing values, fitted like the real model
+    rng = np.random.default_rng(seed)
+    X = rng.normal(loc=[44, 17, 200, 4200], scale=[5, 2, 14, 800], size=(400, 4))
+    y = np.where(X[:, 2] > 205, "Gentoo", np.where(X[:, 0] > 44, "Chinstrap", "Adelie"))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    pipeline = Pipeline([
+        ("imputer", IterativeImputer(max_iter=10, random_state=0)),
+        ("tree", DecisionTreeClassifier(max_depth=6, random_state=0)),
+    ])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # IterativeImputer convergence warnings
+        return pipeline.fit(pd.DataFrame(X, columns=FEATURES), y)
+
+
+PIPELINES = {
+    "fitted": fitted_pipeline,
+    "artifact": lambda: joblib.load(ROOT / "4_Chapter" / "models" / "penguin_classifier.pkl"),
+}
+
+
+@pytest.fixture(params=PIPELINES, scope="module")
+def pipelines(request):
+    pipeline = PIPELINES[request.param]()
+    return pipeline, pipeline_compiler.CompiledPipeline(pipeline)
+
+
+def assert_same(pipeline, compiled, X):
+    labels, proba = compiled.predict_with_proba(X)
+    df = pd.DataFrame(X, columns=compiled.feature_names_in_)
+    assert np.array_equal(labels, pipeline.predict(df))
+    assert np.array_equal(proba, pipeline.predict_proba(df))
+
+
+def random_rows(compiled, n=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    statistics = compiled.imputer.statistics
+    return rng.normal(loc=statistics, scale=np.abs(statistics) * 0.3, size=(n, len(statistics)))
+
+
+def test_random_rows(pipelines):
+    pipeline, compiled = pipelines
+    assert_same(pipeline, compiled, random_rows(compiled))
+
+
+def test_rows_with_missing_values(pipelines):
+    pipeline, compiled = pipelines
+    X = random_rows(compiled, n=500)
+    rng = np.random.default_rng(2)
+    X[rng.random(X.shape) < 0.3] = np.nan
+    # One missing feature per row, every feature, and a row with nothing known
+    n_features = X.shape[1]
+    X[:n_features] = random_rows(compiled, n=n_features, seed=3)
+    X[np.arange(n_features), np.arange(n_features)] = np.nan
+    X[n_features] = np.nan
+    assert_same(pipeline, compiled, X)
+
+
+def test_batch_with_every_value_missing(pipelines):
+    # IterativeImputer only applies the initial imputation in this case
+    pipeline, compiled = pipelines
+    assert_same(pipeline, compiled, np.full((3, len(compiled.feature_names_in_)), np.nan))
+
+
+def test_values_at_tree_thresholds(pipelines):
+    pipeline, compiled = pipelines
+    tree = compiled.tree
+    internal = np.flatnonzero(tree.left != -1)
+    base = random_rows(compiled, n=len(internal), seed=4)
+    rows = []
+    for row, node in zip(base, internal):
+        feature, threshold = tree.feature[node], tree.threshold[node]
+        # Exactly at the threshold, one float32 step around it, and float64
+        # values that only differ from it after the float32 cast
+        threshold32 = np.float32(threshold)
+        for value in (threshold, np.nextafter(threshold32, np.float32(-np.inf)),
+                      np.nextafter(threshold32, np.float32(np.inf)),
+                      threshold * (1 + 1e-12), threshold * (1 - 1e-12)):
+            candidate = row.copy()
+            candidate[feature] = value
+            rows.append(candidate)
+    assert_same(pipeline, compiled, np.array(rows, dtype=np.float64))
+
+
+def test_single_row(pipelines):
+    pipeline, compiled = pipelines
+    assert_same(pipeline, compiled, random_rows(compiled, n=1))
+
+
+def test_empty_batch(pipelines):
+    # sklearn rejects empty inputs; the compiled pipeline returns empty outputs
+    # with the same types as a non-empty prediction
+    pipeline, compiled = pipelines
+    X = random_rows(compiled, n=5)
+    expected_labels, expected_proba = compiled.predict_with_proba(X)
+    labels, proba = compiled.predict_with_proba(X[:0])
+    assert np.array_equal(labels, expected_labels[:0]) and labels.dtype == expected_labels.dtype
+    assert np.array_equal(proba, expected_proba[:0]) and proba.shape == (0, len(compiled.classes_))
+    with pytest.raises(ValueError):
+        pipeline.predict_proba(pd.DataFrame(X[:0], columns=compiled.feature_names_in_))
+
+
+def test_compile_pipeline_does_not_fall_back(pipelines):
+    pipeline, _ = pipelines
+    assert pipeline_compiler.compile_pipeline(pipeline, backend="compiled").backend == "compiled"
@@ -0,0 +1,206 @@
+import pytest
+
+from conftest import load_chapter_module
+
+
+@pytest.fixture(params=["3_Chapter", "4_Chapter"], scope="module")
+def rate_limiting(request):
+    return load_chapter_module(request.param, "rate_limiting")
+
+
+class Clock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def limiter(rate_limiting, algorithm, clock, requests_per_minute=5):
+    cls = rate_limiting.ALGORITHMS[algorithm]
+    return cls(requests_per_minute=requests_per_minute, clock=clock)
+
+
+def allowed(limiter, key="key", n=100):
+    # Requests let through before the first rejection
+    for i in range(n):
+        if limiter.is_rate_limited(key)[0]:
+            return i
+    return n
+
+
+@pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_window"])
+def test_limit_and_remaining(rate_limiting, algorithm):
+    rl = limiter(rate_limiting, algorithm, Clock())
+    results = [rl.is_rate_limited("key") for _ in range(6)]
+    assert results == [(False, 4), (False, 3), (False, 2), (False, 1), (False, 0), (True, 0)]
+    # Other keys have their own budget
+    assert rl.is_rate_limited("other") == (False, 4)
+
+
+@pytest.mark.parametrize("algorithm", ["token_bucket", "gcra"])
+def test_refill_one_request_per_interval(rate_limiting, algorithm):
+    clock = Clock()
+    rl = limiter(rate_limiting, algorithm, clock)
+    assert allowed(rl) == 5
+    clock.now = 11.9
+    assert allowed(rl) == 0
+    # 60 s / 5 requests: one request back every 12 s
+    clock.now = 12.0
+    assert allowed(rl) == 1
+    clock.now = 60.0
+    assert allowed(rl) == 4
+    clock.now = 1000.0
+    assert allowed(rl) == 5
+
+
+def test_sliding_window_weights_previous_window(rate_limiting):
+    clock = Clock()
+    rl = limiter(rate_limiting, "sliding_window", clock)
+    assert allowed(rl) == 5
+    # Start of the next window: the previous one still counts fully
+    clock.now = 60.0
+    assert allowed(rl) == 0
+    # Halfway: 5 * 0.5 from the previous window, so 3 more fit under 5
+    clock.now = 90.0
+    assert allowed(rl) == 3
+    # Two windows later nothing from the first one is left
+    clock.now = 180.0
+    assert allowed(rl) == 5
+
+
+@pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_window"])
+def test_idle_keys_are_evicted(rate_limiting, algorithm):
+    clock = Clock()
+    rl = limiter(rate_limiting, algorithm, clock)
+    for i in range(100):
+        rl.is_rate_limited(f"key-{i}")
+    # Keys that still hold state are kept
+    clock.now = 1.0
+    rl.is_rate_limited("new")
+    assert len(rl) == 101
+
+    # Once they are equivalent to fresh keys, each call evicts a few of them
+    clock.now = 1000.0
+    for _ in range(100 // rl.max_evictions + 1):
+        rl.is_rate_limited("new")
+    assert len(rl) == 1
+    # An evicted key starts over with a full budget
+    assert rl.is_rate_limited("key-0") == (False, 4)
+
+
+def test_incomplete_subclass_fails_at_creation(rate_limiting):
+    class Incomplete(rate_limiting.RateLimiter):
+        def _new_state(self, now):
+            return [now]
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_unknown_algorithm(rate_limiting):
+    with pytest.raises(ValueError):
+        rate_limiting.create_rate_limiter(10, algorithm="leaky", backend="local")
+
+
+# --- Cross-worker limiting: LeasingRateLimiter over a shared backend ---------
+
+def workers(rate_limiting, tmp_path, clock, n, requests_per_minute, **options):
+    # One limiter and one mapping of the shared file per simulated worker
+    path = str(tmp_path / "buckets.bin")
+    return [
+        rate_limiting.LeasingRateLimiter(
+            rate_limiting.SharedTokenBuckets(requests_per_minute, path=path, clock=clock),
+            requests_per_minute=requests_per_minute, clock=clock, **options
+        )
+        for _ in range(n)
+    ]
+
+
+def test_workers_under_the_limit_are_never_rejected(rate_limiting, tmp_path):
+    # 4 workers, bursts of 8 requests every second (480/min) against 6000/min,
+    # for three minutes. Dropping what is left of each expired lease drains the
+    # bucket in about two, after which only the first leases of a burst get tokens
+    clock = Clock()
+    pool = workers(rate_limiting, tmp_path, clock, 4, 6000)
+    rejected = 0
+    for i in range(1440):
+        clock.now = float(i // 8)
+        rejected += pool[i % 4].is_rate_limited("key")[0]
+    assert rejected == 0
+
+
+def test_workers_share_the_limit_exactly(rate_limiting, tmp_path):
+    clock = Clock()
+    pool = workers(rate_limiting, tmp_path, clock, 4, 600)
+    allowed_requests = sum(not pool[i % 4].is_rate_limited("key")[0] for i in range(2000))
+    assert allowed_requests == 600
+
+
+def test_expired_lease_is_given_back(rate_limiting, tmp_path):
+    # 60/min refills one token per second; leases of 6 tokens for 0.5 s
+    clock = Clock()
+    first, second = workers(rate_limiting, tmp_path, clock, 2, 60, lease_size=6, lease_ttl=0.5)
+    assert first.is_rate_limited("key")[0] is False   # leases 6, uses 1
+    clock.now = 0.5
+    # The 5 unused tokens go back before the new lease: 54 + 0.5 refilled + 5
+    assert first.is_rate_limited("key")[0] is False   # leases 6 again, uses 1
+    assert allowed(second, n=1000) == 53
+
+
+def test_evicted_lease_is_given_back(rate_limiting, tmp_path):
+    clock = Clock()
+    first, second = workers(rate_limiting, tmp_path, clock, 2, 60, lease_size=6, lease_ttl=0.5)
+    first.is_rate_limited("key")
+    clock.now = 0.5
+    # Traffic for other keys evicts the expired lease of "key"
+    first.is_rate_limited("other")
+    first.is_rate_limited("other")
+    assert len(first) == 1
+    assert allowed(second, n=1000) == 59
+
+
+class RacingBackend:
+    """
+    Backend that lets a second request for the same key miss the local lease
+    while the first one is still leasing its block
+    """
+    def __init__(self, capacity):
+        self.available = capacity
+        self.limiter = None
+        self.racing = False
+
+    def acquire(self, key, tokens):
+        if self.limiter is not None and not self.racing:
+            self.racing = True
+            self.limiter.is_rate_limited(key)
+        granted = min(tokens, self.available)
+        self.available -= granted
+        return granted, self.available
+
+    def release(self, key, tokens, age=0.0):
+        self.available += tokens
+
+
+def test_concurrent_leases_are_both_kept(rate_limiting):
+    backend = RacingBackend(100)
+    rl = rate_limiting.LeasingRateLimiter(backend, requests_per_minute=100, lease_size=10, clock=Clock())
+    backend.limiter = rl
+    allowed_requests = 1 + allowed(rl, n=1000)  # the nested request was allowed too
+    assert allowed_requests == 100
+
+
+def test_shared_file_refuses_another_limit(rate_limiting, tmp_path):
+    path = str(tmp_path / "buckets.bin")
+    rate_limiting.SharedTokenBuckets(10, path=path).close()
+    rate_limiting.SharedTokenBuckets(10, path=path).close()
+    with pytest.raises(ValueError):
+        rate_limiting.SharedTokenBuckets(3, path=path)
+
+
+def test_default_shared_file_depends_on_the_limit(rate_limiting, monkeypatch, tmp_path):
+    monkeypatch.setattr(rate_limiting, "RATE_LIMIT_SHARED_DIR", tmp_path)
+    ten, three = rate_limiting.SharedTokenBuckets(10), rate_limiting.SharedTokenBuckets(3)
+    assert ten.path != three.path
+    ten.close()
+    three.close()